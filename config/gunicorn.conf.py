@@ -9,9 +9,13 @@ bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"
 backlog = 2048
 
 # Worker processes
-workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2))
-worker_class = 'sync'
-worker_connections = 1000
+# Requests are I/O-bound (JWT, database, Stripe/OpenAI calls), so each worker
+# multiplexes requests with threads (gthread) or greenlets (gevent) instead of
+# blocking one process per in-flight request.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = 1000  # Used by the gevent worker class
 timeout = int(os.environ.get('TIMEOUT', 120))
 keepalive = 2
 
@@ -36,10 +40,41 @@ limit_request_field_size = 8190
 
 # Performance tuning
 worker_tmp_dir = '/dev/shm'  # Use memory for worker temp files
+tmp_upload_dir = '/dev/shm'  # Keep any spooled request bodies in memory as well
 
 # Graceful shutdown
 graceful_timeout = 30
 
+def post_fork(server, worker):
+    """Give each worker its own database pool instead of the preloaded master's sockets"""
+    try:
+        from src.core import database, database_enhanced
+    except ImportError:
+        return
+    if database.engine is not None:
+        database.engine.dispose(close=False)
+    if database_enhanced.enhanced_db is not None and database_enhanced.enhanced_db.engine is not None:
+        database_enhanced.enhanced_db.engine.dispose(close=False)
+
+def post_worker_init(worker):
+    """Let psycopg2 queries yield to other greenlets under the gevent worker
+
+    Gunicorn's gevent worker monkey patches the stdlib itself after fork, but
+    psycopg2 does its socket I/O inside libpq and needs a wait callback.
+    """
+    if worker.cfg.worker_class_str != 'gevent':
+        return
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+def worker_exit(server, worker):
+    """Handle Stripe webhook events still queued when a worker is recycled or stopped"""
+    try:
+        from src.services.payment_service import payment_service
+    except ImportError:
+        return
+    payment_service.drain_webhooks()
+
 # Development vs Production
 if os.environ.get('FLASK_ENV') == 'development':
     reload = True
@@ -5,37 +5,27 @@ Automatically create Supabase tables for VeroctaAI
 """
 
 import os
-from dotenv import load_dotenv
+import sys
 import logging
-from supabase import create_client, Client
 
-load_dotenv()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-def create_tables():
-    """Create all required tables in Supabase"""
-    
-    supabase_url = os.environ.get("SUPABASE_URL")
-    supabase_key = os.environ.get("SUPABASE_ANON_KEY")
-    
-    if not supabase_url or not supabase_key:
-        logging.error("❌ Missing Supabase credentials!")
-        return False
-    
-    try:
-        supabase: Client = create_client(supabase_url, supabase_key)
-        logging.info("✅ Connected to Supabase")
+# Complete DDL for the Supabase SQL Editor, printed in a single write
+_SQL_BUNDLE = """
+-- Enable UUID extension --
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
-        # Note: These SQL commands need to be run in Supabase SQL Editor
-        # as the Python client doesn't have DDL permissions
+-- Enable query statistics (find slow queries in pg_stat_statements) --
+CREATE EXTENSION IF NOT EXISTS pg_stat_statements;
 
-        logging.info("\n📋 Please run these SQL commands in your Supabase SQL Editor:")
-        logging.info("🔗 Go to: https://peddjxzwicclrqbnooiz.supabase.co/project/peddjxzwicclrqbnooiz/sql")
-
-        logging.info("\n-- Enable UUID extension --")
-        logging.info("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\";")
+-- Server-side timeouts for connections through the transaction pooler (6543), --
+-- which does not forward the startup options the app sets on direct connections.
+-- Replace postgres with the role in DATABASE_URL if it differs.
+-- ALTER ROLE postgres SET statement_timeout = '5s';
+-- ALTER ROLE postgres SET idle_in_transaction_session_timeout = '10s';
+-- ALTER ROLE postgres SET lock_timeout = '2s';
 
-        logging.info("\n-- Create Users Table --")
-        logging.info("""
+-- Create Users Table --
 CREATE TABLE IF NOT EXISTS users (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
     email VARCHAR UNIQUE NOT NULL,
@@ -46,10 +36,8 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMP DEFAULT NOW(),
     is_active BOOLEAN DEFAULT TRUE
 );
-""")
 
-        logging.info("\n-- Create Reports Table --")
-        logging.info("""
+-- Create Reports Table --
 CREATE TABLE IF NOT EXISTS reports (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
@@ -63,10 +51,8 @@ CREATE TABLE IF NOT EXISTS reports (
     updated_at TIMESTAMP DEFAULT NOW(),
     status VARCHAR DEFAULT 'completed'
 );
-""")
 
-        logging.info("\n-- Create Insights Table --")
-        logging.info("""
+-- Create Insights Table --
 CREATE TABLE IF NOT EXISTS insights (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
     report_id UUID REFERENCES reports(id) ON DELETE CASCADE,
@@ -79,10 +65,8 @@ CREATE TABLE IF NOT EXISTS insights (
     savings_opportunities INTEGER DEFAULT 0,
     created_at TIMESTAMP DEFAULT NOW()
 );
-""")
 
-        logging.info("\n-- Create Subscriptions Table --")
-        logging.info("""
+-- Create Subscriptions Table --
 CREATE TABLE IF NOT EXISTS subscriptions (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
@@ -96,10 +80,8 @@ CREATE TABLE IF NOT EXISTS subscriptions (
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW()
 );
-""")
 
-        logging.info("\n-- Create Payments Table --")
-        logging.info("""
+-- Create Payments Table --
 CREATE TABLE IF NOT EXISTS payments (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
@@ -112,10 +94,8 @@ CREATE TABLE IF NOT EXISTS payments (
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW()
 );
-""")
 
-        logging.info("\n-- Create Email Logs Table --")
-        logging.info("""
+-- Create Email Logs Table --
 CREATE TABLE IF NOT EXISTS email_logs (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
@@ -126,17 +106,40 @@ CREATE TABLE IF NOT EXISTS email_logs (
     sent_at TIMESTAMP DEFAULT NOW(),
     error_message TEXT
 );
-""")
 
-        logging.info("\n-- Enable Row Level Security (RLS) --")
-        logging.info("""
+-- Create Indexes (equality columns first, range columns last) --
+-- On tables that already hold data, run each statement on its own as
+-- CREATE INDEX CONCURRENTLY to avoid locking writes; it cannot run inside
+-- the SQL Editor's transaction. Verify with EXPLAIN (ANALYZE, BUFFERS) on the
+-- analytics queries that the plan shows an Index Scan, not a Seq Scan.
+CREATE INDEX IF NOT EXISTS reports_user_created_idx ON reports(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS reports_data_gin_idx ON reports USING GIN (data jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS insights_report_user_idx ON insights(report_id, user_id);
+CREATE INDEX IF NOT EXISTS insights_user_idx ON insights(user_id);
+CREATE INDEX IF NOT EXISTS payments_user_status_idx ON payments(user_id, status) WHERE status = 'pending';
+
+-- Weekly per-user roll-up read by the digest email; one indexed row per user --
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_weekly_summary AS
+SELECT user_id,
+       COUNT(*) AS reports_7d,
+       AVG(spend_score) AS score_7d,
+       SUM((data->>'total_amount')::numeric) AS total_7d,
+       MAX(created_at) AS last_report
+FROM reports
+WHERE created_at > NOW() - INTERVAL '7 days'
+GROUP BY user_id;
+-- The unique index lets REFRESH ... CONCURRENTLY run without blocking readers
+CREATE UNIQUE INDEX IF NOT EXISTS user_weekly_summary_user_idx ON user_weekly_summary(user_id);
+-- Refresh nightly, e.g. with pg_cron:
+-- SELECT cron.schedule('refresh-user-weekly-summary', '0 3 * * *',
+--     'REFRESH MATERIALIZED VIEW CONCURRENTLY user_weekly_summary');
+
+-- Enable Row Level Security (RLS) --
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE reports ENABLE ROW LEVEL SECURITY;
 ALTER TABLE insights ENABLE ROW LEVEL SECURITY;
-""")
 
-        logging.info("\n-- Create RLS Policies --")
-        logging.info("""
+-- Create RLS Policies --
 CREATE POLICY "Users can view own profile" ON users FOR SELECT USING (auth.uid() = id);
 CREATE POLICY "Users can update own profile" ON users FOR UPDATE USING (auth.uid() = id);
 
@@ -147,7 +150,31 @@ CREATE POLICY "Users can delete own reports" ON reports FOR DELETE USING (auth.u
 
 CREATE POLICY "Users can view own insights" ON insights FOR SELECT USING (auth.uid() = user_id);
 CREATE POLICY "Users can create own insights" ON insights FOR INSERT WITH CHECK (auth.uid() = user_id);
-""")
+"""
+
+def create_tables():
+    """Create all required tables in Supabase"""
+    
+    supabase_url = os.environ.get("SUPABASE_URL")
+    supabase_key = os.environ.get("SUPABASE_ANON_KEY")
+    
+    if not supabase_url or not supabase_key:
+        logging.error("❌ Missing Supabase credentials!")
+        return False
+    
+    try:
+        # Deferred so the SQL bundle can be printed without loading the SDK at import
+        from src.services.supabase_client import get_supabase_client
+        supabase = get_supabase_client(supabase_url, supabase_key)
+        logging.info("✅ Connected to Supabase")
+
+        # Note: These SQL commands need to be run in Supabase SQL Editor
+        # as the Python client doesn't have DDL permissions
+
+        logging.info("\n📋 Please run these SQL commands in your Supabase SQL Editor:")
+        logging.info("🔗 Go to: https://peddjxzwicclrqbnooiz.supabase.co/project/peddjxzwicclrqbnooiz/sql")
+
+        sys.stdout.write(_SQL_BUNDLE)
 
         logging.info("\n✅ Copy and paste these SQL commands into your Supabase SQL Editor to create the tables.")
         return True
@@ -157,4 +184,6 @@ CREATE POLICY "Users can create own insights" ON insights FOR INSERT WITH CHECK
         return False
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     create_tables()
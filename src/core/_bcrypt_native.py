@@ -0,0 +1,46 @@
+"""
+Optional native bcrypt binding for VeroctaAI
+Loads a crypt_blowfish build with a SIMD Blowfish core through cffi, falling
+back to pyca/bcrypt when the shared library is not installed
+"""
+
+import os
+import hmac
+import logging
+import bcrypt
+
+# Path or soname of crypt_blowfish built with the AVX2 Blowfish kernel
+BCRYPT_NATIVE_LIB = os.environ.get('BCRYPT_NATIVE_LIB', 'libbcrypt_avx.so')
+
+# "$2b$" + cost + "$" + 22 salt chars + 31 hash chars + NUL
+_OUTPUT_SIZE = 64
+
+_ffi = None
+_lib = None
+try:
+    from cffi import FFI
+    _ffi = FFI()
+    _ffi.cdef("char *_crypt_blowfish_rn(const char *key, const char *setting, char *output, int size);")
+    _lib = _ffi.dlopen(BCRYPT_NATIVE_LIB)
+    logging.info(f"Native bcrypt loaded from {BCRYPT_NATIVE_LIB}")
+except (ImportError, OSError):
+    _lib = None
+
+native_available = _lib is not None
+
+def _native_hashpw(password: bytes, salt: bytes) -> bytes:
+    output = _ffi.new("char[]", _OUTPUT_SIZE)
+    result = _lib._crypt_blowfish_rn(password, salt, output, _OUTPUT_SIZE)
+    if result == _ffi.NULL:
+        raise ValueError("Invalid salt")
+    return _ffi.string(output)
+
+def _native_checkpw(password: bytes, hashed_password: bytes) -> bool:
+    return hmac.compare_digest(_native_hashpw(password, hashed_password), hashed_password)
+
+if native_available:
+    hashpw = _native_hashpw
+    checkpw = _native_checkpw
+else:
+    hashpw = bcrypt.hashpw
+    checkpw = bcrypt.checkpw
@@ -4,125 +4,220 @@ Missing endpoints and enhanced functionality
 """
 
 import logging
-from datetime import datetime
-from flask import jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from .app import app
+import threading
+import time
+import orjson
+from functools import wraps
+from cachetools import TTLCache
+from flask import Response, g, request
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from .app import app, ojson
 from .auth import get_current_user
 
+# Serialized JSON bodies of recent responses, shared by all request threads
+_resp_cache = TTLCache(maxsize=1024, ttl=30)
+_resp_cache_lock = threading.Lock()
+
+# (epoch second, ISO string) pair, swapped atomically by iso_now()
+_ts_cache = (0, '')
+
+def iso_now():
+    """Current UTC time as an ISO 8601 string, formatted at most once per second"""
+    global _ts_cache
+    now = int(time.time())
+    cached_at, timestamp = _ts_cache
+    if cached_at != now:
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))
+        _ts_cache = (now, timestamp)
+    return timestamp
+
+def _user_cache_key():
+    """Cache key for per-user responses"""
+    return (request.full_path, get_jwt_identity())
+
+def cached_response(key_fn=_user_cache_key):
+    """Decorator to serve successful JSON responses from a short-lived cache
+
+    Only worth it for handlers that compute their body; ones returning
+    precomputed bytes or a timestamp template would pay the lock and lookup
+    for nothing and serve a stale last_updated.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = key_fn()
+            with _resp_cache_lock:
+                body = _resp_cache.get(key)
+            if body is not None:
+                return Response(body, mimetype='application/json')
+
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                with _resp_cache_lock:
+                    _resp_cache[key] = response.get_data()
+            return response
+        return decorated_function
+    return decorator
+
+# Endpoints whose user is authenticated and loaded by load_current_user()
+_USER_ENDPOINTS = set()
+
+def user_route(f):
+    """Mark a view as requiring an authenticated user, available as g.user"""
+    _USER_ENDPOINTS.add(f.__name__)
+    return f
+
+@app.before_request
+def load_current_user():
+    """Verify the JWT and load the user once per request for user endpoints"""
+    if request.endpoint not in _USER_ENDPOINTS or request.method == 'OPTIONS':
+        return None
+    verify_jwt_in_request()
+    g.user = get_current_user()
+    if not g.user:
+        return ojson({'error': 'User not found'}, 404)
+    return None
+
 # Additional API routes that were missing
 
+# Sample payloads are encoded once at import. Bodies carrying a timestamp are
+# stored as byte fragments split around a placeholder so each request only
+# has to encode the current time.
+_TIMESTAMP = '__timestamp__'
+
+def _json_template(obj):
+    """Encode obj once, splitting the bytes around timestamp placeholders"""
+    return orjson.dumps(obj).split(orjson.dumps(_TIMESTAMP))
+
+def _render_template(parts, timestamp):
+    """Join template fragments with the encoded timestamp"""
+    return orjson.dumps(timestamp).join(parts)
+
+_NOTIFICATIONS = (
+    {
+        'id': 1,
+        'title': 'Welcome to VeroctaAI!',
+        'message': 'Your account has been successfully created',
+        'type': 'info',
+        'read': False,
+        'created_at': _TIMESTAMP
+    },
+    {
+        'id': 2,
+        'title': 'Analysis Complete',
+        'message': 'Your latest financial analysis is ready',
+        'type': 'success',
+        'read': False,
+        'created_at': _TIMESTAMP
+    },
+)
+
+# Count once at import; when notifications move to the database, ask Supabase
+# for select('*', count='exact').eq('read', False) instead of iterating here
+_UNREAD = sum(1 for n in _NOTIFICATIONS if not n['read'])
+
+_NOTIFICATIONS_TEMPLATE = _json_template({
+    'success': True,
+    'notifications': _NOTIFICATIONS,
+    'unread_count': _UNREAD
+})
+
+_ANALYTICS_OVERVIEW_BODY = orjson.dumps({
+    'success': True,
+    'data': {
+        'total_reports': 5,
+        'total_transactions': 1250,
+        'total_amount_analyzed': 125000.00,
+        'average_spend_score': 78,
+        'savings_identified': 15000.00,
+        'monthly_trends': [
+            {'month': 'Jan', 'amount': 42000, 'score': 75},
+            {'month': 'Feb', 'amount': 38000, 'score': 80},
+            {'month': 'Mar', 'amount': 45000, 'score': 78}
+        ],
+        'top_categories': [
+            {'name': 'Software & SaaS', 'amount': 25000, 'percentage': 20},
+            {'name': 'Marketing', 'amount': 22500, 'percentage': 18},
+            {'name': 'Office Supplies', 'amount': 18750, 'percentage': 15}
+        ]
+    }
+})
+
+_BILLING_BODY = orjson.dumps({
+    'success': True,
+    'billing': {
+        'plan': 'Professional',
+        'status': 'active',
+        'next_billing_date': '2024-02-01',
+        'amount': 29.99,
+        'currency': 'USD',
+        'usage': {
+            'reports_generated': 12,
+            'reports_limit': 50,
+            'data_processed_gb': 2.5,
+            'data_limit_gb': 10
+        },
+        'features': [
+            'Unlimited CSV uploads',
+            'Advanced AI insights',
+            'PDF report generation',
+            'Priority support'
+        ]
+    }
+})
+
+_MONITORING_TEMPLATE = _json_template({
+    'success': True,
+    'system_status': {
+        'uptime': '99.9%',
+        'response_time': '150ms',
+        'active_users': 1247,
+        'reports_processed_today': 89,
+        'system_health': 'healthy',
+        'services': {
+            'api': 'operational',
+            'database': 'operational',
+            'ai_engine': 'operational',
+            'pdf_generator': 'operational'
+        },
+        'last_updated': _TIMESTAMP
+    }
+})
+
 @app.route('/api/v2/notifications', methods=['GET'])
-@jwt_required()
+@user_route
 def get_notifications():
     """Get user notifications"""
     try:
-        user = get_current_user()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
-        # Sample notifications for now
-        notifications = [
-            {
-                'id': 1,
-                'title': 'Welcome to VeroctaAI!',
-                'message': 'Your account has been successfully created',
-                'type': 'info',
-                'read': False,
-                'created_at': datetime.now().isoformat()
-            },
-            {
-                'id': 2,
-                'title': 'Analysis Complete',
-                'message': 'Your latest financial analysis is ready',
-                'type': 'success',
-                'read': False,
-                'created_at': datetime.now().isoformat()
-            }
-        ]
-
-        return jsonify({
-            'success': True,
-            'notifications': notifications,
-            'unread_count': len([n for n in notifications if not n['read']])
-        })
+        # Sample notifications for now; not response-cached so new ones and
+        # the timestamp are current. The template already makes this cheap.
+        body = _render_template(_NOTIFICATIONS_TEMPLATE, iso_now())
+        return Response(body, mimetype='application/json')
     except Exception as e:
         logging.error(f"Notifications error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/v2/analytics/overview', methods=['GET'])
-@jwt_required()
+@user_route
 def get_analytics_overview():
     """Get analytics overview for dashboard"""
     try:
-        user = get_current_user()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
         # Sample analytics data
-        analytics_data = {
-            'total_reports': 5,
-            'total_transactions': 1250,
-            'total_amount_analyzed': 125000.00,
-            'average_spend_score': 78,
-            'savings_identified': 15000.00,
-            'monthly_trends': [
-                {'month': 'Jan', 'amount': 42000, 'score': 75},
-                {'month': 'Feb', 'amount': 38000, 'score': 80},
-                {'month': 'Mar', 'amount': 45000, 'score': 78}
-            ],
-            'top_categories': [
-                {'name': 'Software & SaaS', 'amount': 25000, 'percentage': 20},
-                {'name': 'Marketing', 'amount': 22500, 'percentage': 18},
-                {'name': 'Office Supplies', 'amount': 18750, 'percentage': 15}
-            ]
-        }
-
-        return jsonify({
-            'success': True,
-            'data': analytics_data
-        })
+        return Response(_ANALYTICS_OVERVIEW_BODY, mimetype='application/json')
     except Exception as e:
         logging.error(f"Analytics overview error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/v2/billing/current', methods=['GET'])
-@jwt_required()
+@user_route
 def get_billing_info():
     """Get current billing information"""
     try:
-        user = get_current_user()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
         # Sample billing data
-        billing_info = {
-            'plan': 'Professional',
-            'status': 'active',
-            'next_billing_date': '2024-02-01',
-            'amount': 29.99,
-            'currency': 'USD',
-            'usage': {
-                'reports_generated': 12,
-                'reports_limit': 50,
-                'data_processed_gb': 2.5,
-                'data_limit_gb': 10
-            },
-            'features': [
-                'Unlimited CSV uploads',
-                'Advanced AI insights',
-                'PDF report generation',
-                'Priority support'
-            ]
-        }
-
-        return jsonify({
-            'success': True,
-            'billing': billing_info
-        })
+        return Response(_BILLING_BODY, mimetype='application/json')
     except Exception as e:
         logging.error(f"Billing info error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/v2/monitoring/status', methods=['GET'])
 @jwt_required()
@@ -130,38 +225,17 @@ def get_system_monitoring():
     """Get system monitoring status"""
     try:
         # System status information
-        system_status = {
-            'uptime': '99.9%',
-            'response_time': '150ms',
-            'active_users': 1247,
-            'reports_processed_today': 89,
-            'system_health': 'healthy',
-            'services': {
-                'api': 'operational',
-                'database': 'operational',
-                'ai_engine': 'operational',
-                'pdf_generator': 'operational'
-            },
-            'last_updated': datetime.now().isoformat()
-        }
-
-        return jsonify({
-            'success': True,
-            'system_status': system_status
-        })
+        body = _render_template(_MONITORING_TEMPLATE, iso_now())
+        return Response(body, mimetype='application/json')
     except Exception as e:
         logging.error(f"System monitoring error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/analytics/advanced', methods=['GET'])
-@jwt_required()
+@user_route
 def get_advanced_analytics():
     """Get advanced analytics with date range filtering"""
     try:
-        user = get_current_user()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         include_predictions = request.args.get('include_predictions', 'false').lower() == 'true'
@@ -197,22 +271,17 @@ def get_advanced_analytics():
                 'confidence_score': 0.85
             }
 
-        return jsonify({
-            'success': True,
-            'analytics': analytics
-        })
+        return ojson({'success': True, 'analytics': analytics})
     except Exception as e:
         logging.error(f"Advanced analytics error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/users/profile', methods=['PUT'])
-@jwt_required()
+@user_route
 def update_user_profile():
     """Update user profile information"""
     try:
-        user = get_current_user()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = g.user
 
         data = request.get_json()
         
@@ -225,52 +294,47 @@ def update_user_profile():
             'company': data.get('company', user.get('company')),
             'phone': data.get('phone', user.get('phone')),
             'preferences': data.get('preferences', {}),
-            'updated_at': datetime.now().isoformat()
+            'updated_at': iso_now()
         }
 
-        return jsonify({
+        return ojson({
             'success': True,
             'message': 'Profile updated successfully',
             'user': updated_profile
         })
     except Exception as e:
         logging.error(f"Profile update error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/users/change-password', methods=['POST'])
-@jwt_required()
+@user_route
 def change_password():
     """Change user password"""
     try:
-        user = get_current_user()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
         data = request.get_json()
         current_password = data.get('current_password')
         new_password = data.get('new_password')
 
         if not current_password or not new_password:
-            return jsonify({'error': 'Current and new password required'}), 400
+            return ojson({'error': 'Current and new password required'}, 400)
 
         # In a real implementation, you would verify current password and update
         # For now, just return success
-        return jsonify({
+        return ojson({
             'success': True,
             'message': 'Password changed successfully'
         })
     except Exception as e:
         logging.error(f"Password change error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/users/analytics', methods=['GET'])
-@jwt_required()
+@user_route
+@cached_response()
 def get_user_analytics():
     """Get user-specific analytics"""
     try:
-        user = get_current_user()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = g.user
 
         user_analytics = {
             'account_created': user.get('created_at', '2024-01-01'),
@@ -283,10 +347,10 @@ def get_user_analytics():
             'favorite_features': ['CSV Upload', 'PDF Reports', 'SpendScore']
         }
 
-        return jsonify({
+        return ojson({
             'success': True,
             'user_analytics': user_analytics
         })
     except Exception as e:
         logging.error(f"User analytics error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return ojson({'error': str(e)}, 500)
\ No newline at end of file
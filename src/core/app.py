@@ -1,6 +1,9 @@
 import os
+import io
 import logging
-from flask import Flask, send_from_directory, send_file, jsonify
+import orjson
+from flask import Flask, Request, Response, send_from_directory, send_file, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 
@@ -36,9 +39,52 @@ for key, value in os.environ.items():
         logging.info(f"{key}: {'SET' if value else 'EMPTY'}")
 logging.info("=== End Environment Variables Debug ===")
 
+class InMemoryRequest(Request):
+    """Request that spools multipart uploads in memory instead of temp files"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Uploads are bounded by MAX_CONTENT_LENGTH, so they never need to touch disk
+        return io.BytesIO()
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson, keeping Flask's type fallbacks"""
+
+    _handled_kwargs = {"indent", "sort_keys", "separators", "ensure_ascii"}
+
+    def _encode(self, obj, sort_keys, indent, newline=False):
+        # Datetimes pass through to default() so responses keep Flask's HTTP-date format
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if not self._handled_kwargs.issuperset(kwargs):
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, kwargs.get("sort_keys", self.sort_keys), kwargs.get("indent")).decode()
+
+    def response(self, *args, **kwargs):
+        """Build the jsonify() response straight from orjson bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self.app.debug) or self.compact is False
+        return self.app.response_class(
+            self._encode(obj, self.sort_keys, indent, newline=True), mimetype=self.mimetype
+        )
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
 # Create the Flask app for API-only service
 app = Flask(__name__,
             template_folder=os.path.join(basedir, 'templates'))
+app.request_class = InMemoryRequest
+app.json = OrjsonProvider(app)
 # Set secret key with fallback for deployment
 session_secret = os.environ.get("SESSION_SECRET")
 logging.info(f"SESSION_SECRET environment variable: {'SET' if session_secret else 'NOT SET'}")
@@ -51,6 +97,11 @@ if not session_secret:
 app.secret_key = session_secret
 logging.info("Flask app secret key configured successfully")
 
+def ojson(obj, status=200):
+    """Build a JSON response encoded with orjson"""
+    body = orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY)
+    return Response(body, status=status, mimetype='application/json')
+
 # Import and configure enhanced database service (lazy loading)
 try:
     from .database_enhanced import get_enhanced_db
@@ -116,6 +167,23 @@ except ImportError:
     # Routes are imported from routes.py module
     pass
 
+# Materialize every route module, the URL map and the database pool up front
+# so Gunicorn's preload_app master shares them copy-on-write with workers
+try:
+    from . import api_routes_v2, billing_routes
+except ImportError as e:
+    logging.warning(f"⚠️ Could not preload route modules: {str(e)}")
+app.url_map.update()
+
+try:
+    from .database import db_service, remove_session
+    app.teardown_appcontext(remove_session)
+    from .database_enhanced import remove_session as remove_enhanced_session
+    app.teardown_appcontext(remove_enhanced_session)
+    db_service._ensure_connected()
+except Exception as e:
+    logging.warning(f"⚠️ Database pool warm-up skipped: {str(e)}")
+
 if __name__ == '__main__':
     # Production configuration
     is_production = os.environ.get('FLASK_ENV') == 'production'
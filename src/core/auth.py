@@ -1,7 +1,7 @@
 import os
 import bcrypt
 from datetime import datetime, timedelta
-from flask import jsonify, request
+from flask import g, jsonify, request
 from flask_jwt_extended import (
     JWTManager,
     jwt_required,
@@ -11,7 +11,13 @@ from flask_jwt_extended import (
     get_jwt
 )
 from functools import wraps
+from concurrent.futures import Future, ThreadPoolExecutor
+from cachetools import TTLCache
+import hashlib
+import hmac
 import logging
+import orjson
+import threading
 
 try:
     # Attempt to import the database service, assuming it handles Supabase connection
@@ -20,70 +26,160 @@ except ImportError:
     db_service = None
     logging.warning("Database service not found. Supabase integration may not be available.")
 
+from .user_loader import UserLoader, USER_LOADER_TIMEOUT
+from .bcrypt_pool import QueueFullError, check_password, hash_password, needs_rehash, rehash_in_background
+
+# Concurrent get_current_user() lookups share one batched query
+user_loader = UserLoader(db_service.get_users_by_email) if db_service else None
+
+# Recently fetched database user rows by email, shared across requests
+JWT_USER_CACHE_TTL = float(os.environ.get('JWT_USER_CACHE_TTL', 5))
+_user_cache = TTLCache(maxsize=10000, ttl=JWT_USER_CACHE_TTL)
+_user_cache_lock = threading.Lock()
+
+def _get_db_user(email):
+    """Fetch a database user row, served from the short-lived cache when possible"""
+    with _user_cache_lock:
+        db_user = _user_cache.get(email)
+    if db_user is None and user_loader:
+        db_user = user_loader.load(email).result(timeout=USER_LOADER_TIMEOUT)
+        # Misses are not cached here; repeated failed logins are absorbed by the
+        # unknown-email marks, which create_user clears in every worker
+        if db_user is not None:
+            with _user_cache_lock:
+                _user_cache[email] = db_user
+    return db_user
+
+def invalidate_user_cache(email):
+    """Drop a cached user row after the user is created or changed"""
+    with _user_cache_lock:
+        _user_cache.pop(email, None)
+
 # Simple in-memory user store (replace with database in production)
-# Pre-computed password hashes for consistent authentication
-admin_password_hash = b'$2b$12$ZKOiYm4737YUelAqY2xLD.lx7PI8oTUFKZjjfZlmEK3Tzx.q0ZCpm'  # admin123
-demo_password_hash = b'$2b$12$z2zF.Wlh3rF.rSqkaw2Bn.7rG/EbXsuChM/xSdneDmQlVDV6YqtSu'   # demo123
+# Development accounts are hashed at import with a low work factor; they are
+# public demo credentials, so the full production cost buys nothing
+BCRYPT_DEV_COST = int(os.environ.get('BCRYPT_DEV_COST', 4))
+
+def _dev_hash(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_DEV_COST))
+
+def _dev_hash_many(passwords):
+    """Hash several passwords concurrently; bcrypt releases the GIL while hashing"""
+    with ThreadPoolExecutor(max_workers=max(len(passwords), 1)) as executor:
+        return list(executor.map(_dev_hash, passwords))
+
+admin_password_hash, demo_password_hash, test_password_hash = _dev_hash_many(
+    ['admin123', 'demo123', 'testpass123']
+)
+
+class LocalUser:
+    """In-memory user record; slots keep each entry small and attribute reads cheap"""
+    __slots__ = ('id', 'email', 'password', 'role', 'created_at', 'company', 'is_active')
+
+    def __init__(self, id, email, password, role, created_at, company, is_active):
+        self.id = id
+        self.email = email
+        self.password = password
+        self.role = role
+        self.created_at = created_at
+        self.company = company
+        self.is_active = is_active
 
 users_db = {
-    "admin@verocta.ai": {
-        "id": 1,
-        "email": "admin@verocta.ai",
-        "password": admin_password_hash,
-        "role": "admin",
-        "created_at": datetime.now(),
-        "company": "VeroctaAI",
-        "is_active": True
-    },
-    "demo@verocta.ai": {
-        "id": 2,
-        "email": "demo@verocta.ai",
-        "password": demo_password_hash,
-        "role": "user",
-        "created_at": datetime.now(),
-        "company": "VeroctaAI Demo",
-        "is_active": True
-    },
-    "user@verocta.ai": {
-        "id": 3,
-        "email": "user@verocta.ai",
-        "password": demo_password_hash,  # Same password for simplicity
-        "role": "user",
-        "created_at": datetime.now(),
-        "company": "VeroctaAI",
-        "is_active": True
-    },
-    "test@example.com": {
-        "id": 4,
-        "email": "test@example.com",
-        "password": demo_password_hash,  # Same password for simplicity
-        "role": "user",
-        "created_at": datetime.now(),
-        "company": "Test Company",
-        "is_active": True
-    },
-    "test@verocta.ai": {
-        "id": 5,
-        "email": "test@verocta.ai",
-        "password": b'$2b$12$nX3lVDsx9eBsoJBkF3zKRujkOyzUCmyA2CoJEBzLjXpU6VdexNie.',  # testpass123
-        "role": "user",
-        "created_at": datetime.now(),
-        "company": "Test Company LLC",
-        "is_active": True
-    }
+    "admin@verocta.ai": LocalUser(
+        id=1,
+        email="admin@verocta.ai",
+        password=admin_password_hash,
+        role="admin",
+        created_at=datetime.now(),
+        company="VeroctaAI",
+        is_active=True
+    ),
+    "demo@verocta.ai": LocalUser(
+        id=2,
+        email="demo@verocta.ai",
+        password=demo_password_hash,
+        role="user",
+        created_at=datetime.now(),
+        company="VeroctaAI Demo",
+        is_active=True
+    ),
+    "user@verocta.ai": LocalUser(
+        id=3,
+        email="user@verocta.ai",
+        password=demo_password_hash,  # Same password for simplicity
+        role="user",
+        created_at=datetime.now(),
+        company="VeroctaAI",
+        is_active=True
+    ),
+    "test@example.com": LocalUser(
+        id=4,
+        email="test@example.com",
+        password=demo_password_hash,  # Same password for simplicity
+        role="user",
+        created_at=datetime.now(),
+        company="Test Company",
+        is_active=True
+    ),
+    "test@verocta.ai": LocalUser(
+        id=5,
+        email="test@verocta.ai",
+        password=test_password_hash,
+        role="user",
+        created_at=datetime.now(),
+        company="Test Company LLC",
+        is_active=True
+    )
 }
 
-# Simple token revocation store. Uses Redis if available, otherwise in-memory set.
-token_blocklist = None
-try:
-    import redis
-    redis_client = redis.Redis(host='localhost', port=6379, decode_responses=True)
-    redis_client.ping()
-    token_blocklist = redis_client
-    logging.info("Redis connected for token management")
-except:
-    token_blocklist = set()
-    logging.info("Using in-memory token store (Redis not available)")
+# Next id for in-memory users, so signups don't scan users_db
+_next_user_id = max(user.id for user in users_db.values()) + 1
+_user_id_lock = threading.Lock()
+
+def _allocate_user_id():
+    """Reserve the next in-memory user id"""
+    global _next_user_id
+    with _user_id_lock:
+        new_id = _next_user_id
+        _next_user_id += 1
+    return new_id
+
+# Simple token revocation store. Uses Redis if available, otherwise an in-memory
+# TTL cache whose entries expire with the longest-lived (refresh) token.
+# Resolved on first use so importing this module never waits on Redis.
+_token_store = None
+_redis_client = None
+_token_store_lock = threading.Lock()
+
+def _get_token_store():
+    """Get the token store, probing Redis once on first call"""
+    global _token_store, _redis_client
+    if _token_store is None:
+        with _token_store_lock:
+            if _token_store is None:
+                try:
+                    import redis
+                    client = redis.Redis(host='localhost', port=6379, decode_responses=True,
+                                         socket_connect_timeout=0.2)
+                    client.ping()
+                    _redis_client = client
+                    _token_store = client
+                    logging.info("Redis connected for token management")
+                except Exception:
+                    _token_store = TTLCache(maxsize=100000, ttl=int(timedelta(days=30).total_seconds()))
+                    logging.info("Using in-memory token store (Redis not available)")
+    return _token_store
+
+def get_redis_client():
+    """Get the shared Redis client, or None when Redis is not available"""
+    _get_token_store()
+    return _redis_client
+
+# Local view of Redis revocation lookups, so most authenticated requests skip
+# the Redis round trip. Another worker's revocation is seen within the TTL.
+_revoked_cache = TTLCache(maxsize=10000, ttl=30)
+_revoked_cache_lock = threading.Lock()
 
 def init_auth(app):
     """Initialize JWT authentication with Flask app"""
@@ -91,6 +187,9 @@ def init_auth(app):
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', app.secret_key)
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    # Tokens are only ever signed with the shared secret; pin the HMAC algorithm
+    app.config['JWT_ALGORITHM'] = 'HS256'
+    app.config['JWT_DECODE_ALGORITHMS'] = ['HS256']
     
     jwt = JWTManager(app)
     
@@ -98,37 +197,141 @@ def init_auth(app):
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
         jti = jwt_payload['jti']
-        if isinstance(token_blocklist, set):
-            return jti in token_blocklist
+        token_blocklist = _get_token_store()
+        if isinstance(token_blocklist, TTLCache):
+            with _revoked_cache_lock:
+                return jti in token_blocklist
+        with _revoked_cache_lock:
+            revoked = _revoked_cache.get(jti)
+        if revoked is not None:
+            return revoked
         try:
-            return token_blocklist.get(jti) is not None
+            revoked = token_blocklist.get(jti) is not None
         except:
             return False
+        with _revoked_cache_lock:
+            _revoked_cache[jti] = revoked
+        return revoked
     
     return jwt
 
 def revoke_token(jti):
     """Revoke a token by adding it to blocklist"""
-    if isinstance(token_blocklist, set):
-        token_blocklist.add(jti)
+    token_blocklist = _get_token_store()
+    if isinstance(token_blocklist, TTLCache):
+        with _revoked_cache_lock:
+            token_blocklist[jti] = True
     else:
+        with _revoked_cache_lock:
+            _revoked_cache[jti] = True
         try:
             token_blocklist.setex(jti, 86400 * 30, "revoked")  # 30 days expiry
         except:
             pass
 
+def _upgrade_password_hash(email, password):
+    """Re-hash a legacy low-cost database password at BCRYPT_COST"""
+    def _store(new_hash):
+        if db_service.update_user_password(email, new_hash.decode('utf-8')):
+            invalidate_user_cache(email)
+    rehash_in_background(password.encode('utf-8'), _store)
+
+# bcrypt checks in flight, keyed by (email, sha256(password), stored hash), so a
+# burst of identical logins waits on one computation instead of running N
+_inflight_checks = {}
+_inflight_lock = threading.Lock()
+
+def _check_password_once(email, password, stored_password):
+    """check_password(), shared by concurrent callers with the same credentials"""
+    key = (email, hashlib.sha256(password.encode('utf-8')).digest(), stored_password)
+    with _inflight_lock:
+        future = _inflight_checks.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _inflight_checks[key] = future
+    if not owner:
+        return future.result()
+
+    try:
+        future.set_result(check_password(password.encode('utf-8'), stored_password))
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _inflight_lock:
+            _inflight_checks.pop(key, None)
+    return future.result()
+
+# Emails recently confirmed not to exist, so repeated failed logins skip the
+# database. Kept in Redis when available so create_user on any worker clears
+# them; the in-process fallback cannot be cleared across workers, so a user
+# registered on another worker may be refused there for up to its short TTL.
+UNKNOWN_EMAIL_TTL = 30
+UNKNOWN_EMAIL_LOCAL_TTL = 5
+_unknown_email_cache = TTLCache(maxsize=10000, ttl=UNKNOWN_EMAIL_LOCAL_TTL)
+_unknown_email_lock = threading.Lock()
+
+def _email_known_missing(email):
+    """Whether email was recently confirmed not to exist"""
+    store = get_redis_client()
+    if store is not None:
+        try:
+            return store.exists(f"auth:unknown:{email}") > 0
+        except Exception:
+            pass
+    with _unknown_email_lock:
+        return email in _unknown_email_cache
+
+def _mark_email_missing(email):
+    store = get_redis_client()
+    if store is not None:
+        try:
+            store.set(f"auth:unknown:{email}", 1, ex=UNKNOWN_EMAIL_TTL)
+            return
+        except Exception:
+            pass
+    with _unknown_email_lock:
+        _unknown_email_cache[email] = True
+
+def _forget_email_missing(email):
+    store = get_redis_client()
+    if store is not None:
+        try:
+            store.delete(f"auth:unknown:{email}")
+        except Exception:
+            pass
+    with _unknown_email_lock:
+        _unknown_email_cache.pop(email, None)
+_dummy_hash = None
+
+def _dummy_password_check(password):
+    """Spend the same bcrypt time as a real check so unknown emails aren't distinguishable"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(b'verocta-dummy-password')
+    check_password(password.encode('utf-8'), _dummy_hash)
+
 def validate_user(email, password):
     """Validate user credentials"""
     try:
+        if _email_known_missing(email):
+            _dummy_password_check(password)
+            return None
+
         # Try database first
+        db_user = None
+        checked = False
         if db_service:
-            db_user = db_service.get_user_by_email(email)
+            db_user = _get_db_user(email)
             if db_user and db_user.get('is_active'):
                 stored_password = db_user['password_hash']
                 if isinstance(stored_password, str):
                     stored_password = stored_password.encode('utf-8')
                 
-                if bcrypt.checkpw(password.encode('utf-8'), stored_password):
+                checked = True
+                if _check_password_once(email, password, stored_password):
+                    if needs_rehash(stored_password):
+                        _upgrade_password_hash(email, password)
                     return {
                         'id': db_user['id'],
                         'email': db_user['email'],
@@ -139,16 +342,25 @@ def validate_user(email, password):
         # Fallback to in-memory users
         if email in users_db:
             user = users_db[email]
-            if user.get('is_active') and bcrypt.checkpw(password.encode('utf-8'), user['password']):
-                return {
-                    'id': user['id'],
-                    'email': user['email'],
-                    'role': user.get('role', 'user'),
-                    'company': user.get('company', 'Default Company')
-                }
+            if user.is_active:
+                checked = True
+                if _check_password_once(email, password, user.password):
+                    return {
+                        'id': user.id,
+                        'email': user.email,
+                        'role': user.role,
+                        'company': user.company
+                    }
+        elif not db_user:
+            _mark_email_missing(email)
         
+        # Unknown and inactive accounts spend the same bcrypt time as a wrong password
+        if not checked:
+            _dummy_password_check(password)
         return None
         
+    except QueueFullError:
+        raise
     except Exception as e:
         logging.error(f"User validation error: {str(e)}")
         return None
@@ -157,11 +369,14 @@ def create_user(email, password, company=None, role="user"):
     """Create a new user"""
     try:
         # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        password_hash = hash_password(password.encode('utf-8'))
         
         # Try database first
         if db_service:
             db_user = db_service.create_user(email, password_hash.decode('utf-8'), company, role)
+            invalidate_user_cache(email)
+            # After the insert, so a failed login racing it cannot re-mark the email
+            _forget_email_missing(email)
             if db_user:
                 return {
                     'id': db_user['id'],
@@ -174,16 +389,17 @@ def create_user(email, password, company=None, role="user"):
         if email in users_db:
             return None  # User already exists
         
-        new_user_id = max([user['id'] for user in users_db.values()], default=0) + 1
-        users_db[email] = {
-            'id': new_user_id,
-            'email': email,
-            'password': password_hash,
-            'role': role,
-            'company': company or 'Default Company',
-            'created_at': datetime.now(),
-            'is_active': True
-        }
+        new_user_id = _allocate_user_id()
+        users_db[email] = LocalUser(
+            id=new_user_id,
+            email=email,
+            password=password_hash,
+            role=role,
+            company=company or 'Default Company',
+            created_at=datetime.now(),
+            is_active=True
+        )
+        _forget_email_missing(email)
         
         return {
             'id': new_user_id,
@@ -192,20 +408,36 @@ def create_user(email, password, company=None, role="user"):
             'company': company or 'Default Company'
         }
         
+    except QueueFullError:
+        raise
     except Exception as e:
         logging.error(f"User creation error: {str(e)}")
         return None
 
 def get_current_user():
-    """Get current user from JWT token"""
+    """Get current user from JWT token, looked up at most once per request"""
     try:
         email = get_jwt_identity()
-        if not email:
-            return None
-        
+    except Exception as e:
+        logging.error(f"Get current user error: {str(e)}")
+        return None
+    if not email:
+        return None
+
+    # Keyed by identity so a lookup made before the JWT was verified is not reused
+    cached = g.get('_current_user_cache')
+    if cached is not None and cached[0] == email:
+        return cached[1]
+    user = _load_current_user(email)
+    g._current_user_cache = (email, user)
+    return user
+
+def _load_current_user(email):
+    """Look up the active user with the given email"""
+    try:
         # Try database first
-        if db_service:
-            db_user = db_service.get_user_by_email(email)
+        if user_loader:
+            db_user = _get_db_user(email)
             if db_user and db_user.get('is_active'):
                 return {
                     'id': db_user['id'],
@@ -218,13 +450,13 @@ def get_current_user():
         # Fallback to in-memory users
         if email in users_db:
             user = users_db[email]
-            if user.get('is_active'):
+            if user.is_active:
                 return {
-                    'id': user['id'],
-                    'email': user['email'],
-                    'role': user.get('role', 'user'),
-                    'company': user.get('company', 'Default Company'),
-                    'created_at': user.get('created_at')
+                    'id': user.id,
+                    'email': user.email,
+                    'role': user.role,
+                    'company': user.company,
+                    'created_at': user.created_at
                 }
         
         return None
@@ -233,24 +465,29 @@ def get_current_user():
         logging.error(f"Get current user error: {str(e)}")
         return None
 
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+_ADMIN_REQUIRED = (orjson.dumps({'error': 'Admin access required'}), 403, _JSON_HEADERS)
+
 def require_admin(f):
     """Decorator to require admin role"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         user = get_current_user()
-        if not user or user.get('role') != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
+        if not user or not hmac.compare_digest(user.get('role') or '', 'admin'):
+            return _ADMIN_REQUIRED
         return f(*args, **kwargs)
     return decorated_function
 
 def require_role(role):
     """Decorator factory to require specific role"""
+    # The rejection body only depends on the role, so encode it once here
+    role_required = (orjson.dumps({'error': f'{role} access required'}), 403, _JSON_HEADERS)
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             user = get_current_user()
-            if not user or user.get('role') != role:
-                return jsonify({'error': f'{role} access required'}), 403
+            if not user or not hmac.compare_digest(user.get('role') or '', role):
+                return role_required
             return f(*args, **kwargs)
         return decorated_function
     return decorator
@@ -264,19 +501,21 @@ def init_mock_users():
         ("charlie@enterprise.com", "password123", "Enterprise Corp", "admin")
     ]
     
-    for email, password, company, role in mock_users:
+    new_users = [user for user in mock_users if user[0] not in users_db]
+    hashes = _dev_hash_many([password for _, password, _, _ in new_users])
+    
+    for (email, _, company, role), password_hash in zip(new_users, hashes):
         if email not in users_db:
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-            new_id = max([user['id'] for user in users_db.values()], default=4) + 1
-            users_db[email] = {
-                'id': new_id,
-                'email': email,
-                'password': password_hash,
-                'role': role,
-                'company': company,
-                'created_at': datetime.now(),
-                'is_active': True
-            }
+            new_id = _allocate_user_id()
+            users_db[email] = LocalUser(
+                id=new_id,
+                email=email,
+                password=password_hash,
+                role=role,
+                company=company,
+                created_at=datetime.now(),
+                is_active=True
+            )
 
 # Initialize mock users
 init_mock_users()
\ No newline at end of file
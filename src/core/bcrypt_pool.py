@@ -0,0 +1,139 @@
+"""
+Bounded bcrypt worker pool for VeroctaAI
+Runs password hashing off the request threads with backpressure
+"""
+
+import os
+import queue
+import logging
+import threading
+import multiprocessing
+import bcrypt
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from . import _bcrypt_native
+
+# Work factor for new hashes; stored hashes below it are upgraded on login
+BCRYPT_COST = int(os.environ.get('BCRYPT_COST', 12))
+BCRYPT_WORKER_POOL_SIZE = int(os.environ.get('BCRYPT_WORKER_POOL_SIZE', (os.cpu_count() or 1) * 2))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', 64))
+# Seconds a request thread waits for its hash before giving up
+BCRYPT_TIMEOUT = float(os.environ.get('BCRYPT_TIMEOUT', 10))
+
+class QueueFullError(Exception):
+    """Raised when too many bcrypt operations are already in flight"""
+
+class HashTimeoutError(QueueFullError):
+    """Raised when a queued bcrypt operation misses BCRYPT_TIMEOUT; callers
+    treat it like a full queue and ask the client to retry"""
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_in_flight = 0
+
+# Salts generated ahead of time by a daemon thread, so a signup only waits on
+# the key schedule itself
+_salt_pool = queue.Queue(maxsize=64)
+_salt_filler_pid = None
+
+def _fill_salt_pool():
+    while True:
+        _salt_pool.put(bcrypt.gensalt(rounds=BCRYPT_COST))
+
+def _get_salt() -> bytes:
+    """Take a pre-generated salt, generating one inline if the pool is empty"""
+    global _salt_filler_pid
+    if _salt_filler_pid != os.getpid():
+        # Threads do not survive fork, so each worker starts its own filler
+        with _lock:
+            if _salt_filler_pid != os.getpid():
+                _salt_filler_pid = os.getpid()
+                threading.Thread(target=_fill_salt_pool, daemon=True).start()
+    try:
+        return _salt_pool.get_nowait()
+    except queue.Empty:
+        return bcrypt.gensalt(rounds=BCRYPT_COST)
+
+def _hash(plain: bytes, salt: bytes) -> bytes:
+    return _bcrypt_native.hashpw(plain, salt)
+
+def _check(plain: bytes, hashed: bytes) -> bool:
+    return _bcrypt_native.checkpw(plain, hashed)
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Create the pool on first use in each process (gunicorn preloads, then forks)
+
+    Workers come from a forkserver: forking the threaded gunicorn worker
+    directly could copy a lock another thread holds into the child.
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ProcessPoolExecutor(
+            max_workers=BCRYPT_WORKER_POOL_SIZE,
+            mp_context=multiprocessing.get_context('forkserver')
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+def _run(fn, *args):
+    """Submit fn to the pool, refusing work once the queue is full"""
+    global _in_flight
+    with _lock:
+        if _in_flight >= BCRYPT_MAX_QUEUE:
+            raise QueueFullError("Password hashing queue is full")
+        _in_flight += 1
+        executor = _get_executor()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        _release()
+        raise
+    # A timed-out hash keeps its worker busy, so it stays counted until done
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=BCRYPT_TIMEOUT)
+    except FuturesTimeoutError:
+        raise HashTimeoutError("Password hashing timed out") from None
+
+def _release(future=None):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+def hash_password(plain: bytes) -> bytes:
+    """Hash a password with a fresh salt at BCRYPT_COST"""
+    return _run(_hash, plain, _get_salt())
+
+def check_password(plain: bytes, hashed: bytes) -> bool:
+    """Check a password against a bcrypt hash"""
+    return _run(_check, plain, hashed)
+
+def needs_rehash(hashed: bytes) -> bool:
+    """Whether a stored $2b$NN$ hash uses fewer rounds than BCRYPT_COST"""
+    try:
+        return int(hashed.split(b'$')[2]) < BCRYPT_COST
+    except (IndexError, ValueError):
+        return False
+
+def rehash_in_background(plain: bytes, on_done) -> None:
+    """Hash at BCRYPT_COST without blocking, then call on_done(new_hash)
+
+    Skipped when the pool is saturated; the next login tries again.
+    """
+    global _in_flight
+    with _lock:
+        if _in_flight >= BCRYPT_MAX_QUEUE:
+            return
+        _in_flight += 1
+        executor = _get_executor()
+
+    def _finish(future):
+        global _in_flight
+        with _lock:
+            _in_flight -= 1
+        try:
+            on_done(future.result())
+        except Exception as e:
+            logging.error(f"Password rehash error: {str(e)}")
+
+    executor.submit(_hash, plain, _get_salt()).add_done_callback(_finish)
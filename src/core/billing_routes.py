@@ -6,50 +6,109 @@ Handles Stripe integration, checkout, webhooks, and subscription management
 import os
 import json
 import logging
+import threading
+import orjson
 from datetime import datetime
-from flask import jsonify, request, redirect
+from cachetools import TTLCache
+from flask import Response, jsonify, request, redirect
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from .app import app
-from .auth import get_current_user
+from .auth import get_current_user, get_redis_client
 from ..services.payment_service import payment_service
 
 # Stripe configuration
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', 'pk_test_demo')
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
 
+# Redirect targets, built once from FRONTEND_URL
+_SUCCESS_URL = f"{FRONTEND_URL}/billing/success?session_id={{CHECKOUT_SESSION_ID}}"
+_CANCEL_URL = f"{FRONTEND_URL}/billing/cancel"
+_PORTAL_RETURN_URL = f"{FRONTEND_URL}/billing"
+_DEMO_CHECKOUT_URL = f"{FRONTEND_URL}/billing/success?session_id=demo_session_123"
+_DEMO_PORTAL_URL = f"{FRONTEND_URL}/billing/manage"
+
+# The config only depends on environment read at import, so its JSON body is
+# encoded once. Each request still gets its own Response object, since
+# after_request hooks (CORS) mutate response headers.
+_BILLING_CONFIG_BODY = orjson.dumps({
+    'success': True,
+    'publishable_key': STRIPE_PUBLISHABLE_KEY,
+    'plans': {
+        'free': {
+            'name': 'Free Plan',
+            'price': 0,
+            'currency': 'USD',
+            'features': ['Up to 5 reports', 'Basic analytics', 'CSV upload']
+        },
+        'professional': {
+            'name': 'Professional Plan', 
+            'price': 29,
+            'price_id': 'price_professional',
+            'currency': 'USD',
+            'features': ['Unlimited reports', 'Advanced AI insights', 'PDF reports', 'Priority support']
+        },
+        'enterprise': {
+            'name': 'Enterprise Plan',
+            'price': 99,
+            'price_id': 'price_enterprise', 
+            'currency': 'USD',
+            'features': ['Everything in Professional', 'Custom integrations', 'Dedicated support', 'White-label options']
+        }
+    }
+})
+
+# Billing bodies are a few small fields
+_MAX_JSON_BODY = 4096
+
+# Stripe customer id per user, so repeat checkouts skip customer creation.
+# Stored in the Redis instance auth uses for tokens, or in-process without it.
+_CUSTOMER_ID_TTL = 86400 * 30
+_customer_ids = TTLCache(maxsize=10000, ttl=_CUSTOMER_ID_TTL)
+_customer_ids_lock = threading.Lock()
+
+def _get_customer_id(user_id):
+    """Cached Stripe customer id for a user, or None"""
+    store = get_redis_client()
+    if store is not None:
+        try:
+            return store.get(f"stripe:customer:{user_id}")
+        except Exception:
+            return None
+    with _customer_ids_lock:
+        return _customer_ids.get(user_id)
+
+def _set_customer_id(user_id, customer_id):
+    """Remember a user's Stripe customer id"""
+    store = get_redis_client()
+    if store is not None:
+        try:
+            store.setex(f"stripe:customer:{user_id}", _CUSTOMER_ID_TTL, customer_id)
+        except Exception:
+            pass
+        return
+    with _customer_ids_lock:
+        _customer_ids[user_id] = customer_id
+
+def _json_body():
+    """Parsed JSON object body, {} when empty or not an object, None when over _MAX_JSON_BODY
+
+    Chunked requests carry no Content-Length; MAX_CONTENT_LENGTH bounds those.
+    """
+    if request.content_length is not None and request.content_length > _MAX_JSON_BODY:
+        return None
+    data = request.get_json(silent=True, cache=False)
+    return data if isinstance(data, dict) else {}
+
+def _display_name(user):
+    """Customer name for Stripe, falling back to the email when no name is set"""
+    if 'first_name' not in user:
+        return user['email']
+    return f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() or user['email']
+
 @app.route('/api/billing/config', methods=['GET'])
 def get_billing_config():
     """Get billing configuration including Stripe publishable key"""
-    try:
-        return jsonify({
-            'success': True,
-            'publishable_key': STRIPE_PUBLISHABLE_KEY,
-            'plans': {
-                'free': {
-                    'name': 'Free Plan',
-                    'price': 0,
-                    'currency': 'USD',
-                    'features': ['Up to 5 reports', 'Basic analytics', 'CSV upload']
-                },
-                'professional': {
-                    'name': 'Professional Plan', 
-                    'price': 29,
-                    'price_id': 'price_professional',
-                    'currency': 'USD',
-                    'features': ['Unlimited reports', 'Advanced AI insights', 'PDF reports', 'Priority support']
-                },
-                'enterprise': {
-                    'name': 'Enterprise Plan',
-                    'price': 99,
-                    'price_id': 'price_enterprise', 
-                    'currency': 'USD',
-                    'features': ['Everything in Professional', 'Custom integrations', 'Dedicated support', 'White-label options']
-                }
-            }
-        })
-    except Exception as e:
-        logging.error(f"Error getting billing config: {str(e)}")
-        return jsonify({'error': 'Failed to get billing configuration'}), 500
+    return Response(_BILLING_CONFIG_BODY, mimetype='application/json')
 
 @app.route('/api/billing/create-checkout', methods=['POST'])
 @jwt_required()
@@ -60,60 +119,59 @@ def create_checkout_session():
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        data = request.get_json()
+        data = _json_body()
+        if data is None:
+            return jsonify({'error': 'Request body too large'}), 413
         price_id = data.get('price_id')
         
         if not price_id:
             return jsonify({'error': 'Price ID required'}), 400
 
+        user_id = str(user['id'])
+
         # Create or get Stripe customer
-        customer = payment_service.create_customer(
-            email=user['email'],
-            name=f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() or user['email'],
-            company=user.get('company', 'Default Company')
-        )
-        
-        if not customer:
-            return jsonify({'error': 'Failed to create customer'}), 500
+        customer_id = _get_customer_id(user_id)
+        if not customer_id:
+            customer = payment_service.create_customer(
+                email=user['email'],
+                name=_display_name(user),
+                company=user.get('company', 'Default Company')
+            )
+            
+            if not customer:
+                return jsonify({'error': 'Failed to create customer'}), 500
+            customer_id = customer['id']
+            _set_customer_id(user_id, customer_id)
 
         # For demo mode, return demo checkout session
         if not payment_service.stripe_enabled:
             return jsonify({
                 'success': True,
                 'demo_mode': True,
-                'checkout_url': f"{FRONTEND_URL}/billing/success?session_id=demo_session_123",
+                'checkout_url': _DEMO_CHECKOUT_URL,
                 'session_id': 'demo_session_123'
             })
 
         # Create Stripe Checkout Session
-        import stripe
-        try:
-            checkout_session = stripe.checkout.Session.create(
-                customer=customer['id'],
-                payment_method_types=['card'],
-                line_items=[{
-                    'price': price_id,
-                    'quantity': 1,
-                }],
-                mode='subscription',
-                success_url=f"{FRONTEND_URL}/billing/success?session_id={{CHECKOUT_SESSION_ID}}",
-                cancel_url=f"{FRONTEND_URL}/billing/cancel",
-                metadata={
-                    'user_id': str(user['id']),
-                    'user_email': user['email']
-                }
-            )
-            
-            return jsonify({
-                'success': True,
-                'checkout_url': checkout_session.url,
-                'session_id': checkout_session.id
-            })
-            
-        except stripe.error.StripeError as e:
-            logging.error(f"Stripe checkout error: {str(e)}")
+        checkout_session = payment_service.create_checkout_session(
+            customer_id=customer_id,
+            price_id=price_id,
+            success_url=_SUCCESS_URL,
+            cancel_url=_CANCEL_URL,
+            metadata={
+                'user_id': user_id,
+                'user_email': user['email']
+            }
+        )
+        if not checkout_session:
             return jsonify({'error': 'Failed to create checkout session'}), 500
 
+        return jsonify({
+            'success': True,
+            'checkout_url': checkout_session['url'],
+            'session_id': checkout_session['id']
+        })
+
     except Exception as e:
         logging.error(f"Create checkout error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -157,28 +215,24 @@ def create_customer_portal():
             return jsonify({
                 'success': True,
                 'demo_mode': True,
-                'portal_url': f"{FRONTEND_URL}/billing/manage"
+                'portal_url': _DEMO_PORTAL_URL
             })
 
         # Get customer ID (would normally be stored in database)
         customer_id = f"demo_customer_{user['email'].replace('@', '_')}"
         
-        import stripe
-        try:
-            portal_session = stripe.billing_portal.Session.create(
-                customer=customer_id,
-                return_url=f"{FRONTEND_URL}/billing"
-            )
-            
-            return jsonify({
-                'success': True,
-                'portal_url': portal_session.url
-            })
-            
-        except stripe.error.StripeError as e:
-            logging.error(f"Stripe portal error: {str(e)}")
+        portal_session = payment_service.create_billing_portal_session(
+            customer_id=customer_id,
+            return_url=_PORTAL_RETURN_URL
+        )
+        if not portal_session:
             return jsonify({'error': 'Failed to create customer portal'}), 500
 
+        return jsonify({
+            'success': True,
+            'portal_url': portal_session['url']
+        })
+
     except Exception as e:
         logging.error(f"Customer portal error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -234,7 +288,9 @@ def cancel_subscription():
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        data = request.get_json()
+        data = _json_body()
+        if data is None:
+            return jsonify({'error': 'Request body too large'}), 413
         subscription_id = data.get('subscription_id')
         
         if not subscription_id:
@@ -1,24 +1,235 @@
 import os
 import logging
-from sqlalchemy import create_engine, text, Column, String, Integer, DateTime, Boolean, JSON, DECIMAL
+import threading
+from sqlalchemy import bindparam, create_engine, DefaultClause, delete, func, insert, inspect, select, text, Column, String, Integer, DateTime, Boolean, Numeric, Index, MetaData, Table
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.pool import NullPool
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
+from sqlalchemy.orm import deferred, relationship, scoped_session, selectinload, sessionmaker, undefer_group
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.pool import NullPool, QueuePool
+from typing import Dict, List, Any, Optional, Union
 import json
 
 # Load environment variables
+# Point DATABASE_URL at the Supavisor transaction pooler (port 6543), e.g.
+# postgresql+psycopg2://postgres.<ref>:<password>@aws-1-us-east-2.pooler.supabase.com:6543/postgres?sslmode=require
+# Transaction mode hands the backend back after every transaction, so
+# session state (PREPARE, SET, LISTEN, temp tables, advisory locks) must
+# not be relied upon across statements.
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 engine = None
 Session = None
 connected = False
+_initialize_attempted = False
+_initialize_lock = threading.Lock()
+
+def _uses_transaction_pooler(database_url: Optional[str]) -> bool:
+    """Whether the URL points at a transaction-mode pooler (Supavisor 6543 / PgBouncer)"""
+    return bool(database_url) and (':6543/' in database_url or 'pgbouncer' in database_url)
+
+def engine_options(connect_timeout: int = 5, application_name: str = "VeroctaAI-Backend",
+                   database_url: Optional[str] = None, pool_size: Optional[int] = None,
+                   max_overflow: Optional[int] = None) -> Dict[str, Any]:
+    """Shared create_engine() keyword arguments for Supabase engines
+
+    Pooling is tuned through DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and
+    DB_POOL_RECYCLE; set DB_POOL_CLASS=null to open a connection per checkout.
+    pool_size/max_overflow override the environment for a secondary engine.
+    """
+    database_url = database_url or DATABASE_URL
+    # Pre-ping costs a round trip per checkout and through a transaction pooler
+    # can hold a backend; there, recycle connections quickly instead
+    pre_ping_default = "false" if _uses_transaction_pooler(database_url) else "true"
+    pre_ping = os.getenv("DB_POOL_PRE_PING", pre_ping_default).lower() in ("1", "true", "yes")
+    # psycopg2 folds connect_args into the libpq conninfo, so these go out in the
+    # startup packet alongside the URL's own parameters; no SET follows the
+    # handshake. Values already given in DATABASE_URL take precedence.
+    url_params = make_url(database_url).query if database_url else {}
+    libpq_params = {
+        "sslmode": "require",
+        "connect_timeout": connect_timeout,
+        "application_name": application_name
+    }
+    options = {
+        "pool_pre_ping": pre_ping,
+        "connect_args": {name: value for name, value in libpq_params.items() if name not in url_params}
+    }
+    # Server-side timeouts so a runaway query or leaked transaction can't pin a
+    # pooled connection. Sent as startup parameters, which the transaction
+    # pooler does not pass through; there, set them on the role instead.
+    if not _uses_transaction_pooler(database_url):
+        server_settings = {
+            "statement_timeout": os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"),
+            "idle_in_transaction_session_timeout": os.getenv("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", "10000"),
+            "lock_timeout": os.getenv("DB_LOCK_TIMEOUT_MS", "2000")
+        }
+        options["connect_args"]["options"] = " ".join(f"-c {name}={value}" for name, value in server_settings.items())
+    # Transaction poolers can't track server-side prepared statements. psycopg2
+    # never prepares; psycopg 3 does, so turn that off for it.
+    if (database_url or "").startswith("postgresql+psycopg://"):
+        options["connect_args"]["prepare_threshold"] = None
+    # Rows per multi-row INSERT ... VALUES statement for the bulk create methods
+    options["insertmanyvalues_page_size"] = int(os.getenv("DB_INSERT_PAGE_SIZE", 1000))
+    if os.getenv("DB_POOL_CLASS", "queue").lower() == "null":
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=QueuePool,
+            pool_size=pool_size if pool_size is not None else int(os.getenv("DB_POOL_SIZE", 10)),
+            max_overflow=max_overflow if max_overflow is not None else int(os.getenv("DB_MAX_OVERFLOW", 5)),
+            pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800 if pre_ping else 60)),
+            # Reuse the most recently returned connection so idle ones can expire
+            pool_use_lifo=True
+        )
+    return options
+
+def _missing_indexes(connection, metadata) -> List[Index]:
+    """Indexes metadata declares on existing tables that the database lacks
+
+    create_all() only builds indexes along with a new table, so ones added to
+    a model's __table_args__ later would otherwise never reach a database
+    created earlier. Column(index=True) indexes have always shipped with
+    their tables and are left alone. So are indexes over columns the existing
+    table lacks (e.g. an insights table created by setup_supabase_tables.py
+    has no insight_type), since CREATE INDEX would fail and roll back the
+    rest of the upgrade with it.
+    """
+    tables = [table.name for table in metadata.sorted_tables]
+    existing = set(connection.execute(
+        text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename IN :tables")
+        .bindparams(bindparam("tables", expanding=True)),
+        {"tables": tables}
+    ).scalars())
+    columns = set(connection.execute(
+        text(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name IN :tables"
+        ).bindparams(bindparam("tables", expanding=True)),
+        {"tables": tables}
+    ).tuples())
+    return [
+        index for table in metadata.sorted_tables for index in table.indexes
+        if index.name not in existing
+        and not any(column.index for column in index.columns)
+        and all((table.name, column.name) in columns for column in index.columns)
+    ]
+
+def _missing_defaults(connection, metadata) -> List[Column]:
+    """Columns with a server_default that the existing table lacks
+
+    Moving a default from Python into the database changes nothing for a
+    table that already exists, and inserts that leave the column out would
+    then write NULL.
+    """
+    tables = [table.name for table in metadata.sorted_tables]
+    without_default = set(connection.execute(
+        text(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name IN :tables AND column_default IS NULL"
+        ).bindparams(bindparam("tables", expanding=True)),
+        {"tables": tables}
+    ).tuples())
+    return [
+        column for table in metadata.sorted_tables for column in table.columns
+        if isinstance(column.server_default, DefaultClause) and (table.name, column.name) in without_default
+    ]
+
+def _json_columns(connection, metadata) -> List[Column]:
+    """JSONB columns that an existing table still stores as plain json
+
+    Tables created before the models moved to JSONB keep their json columns,
+    and GIN indexes cannot be built on json.
+    """
+    tables = [table.name for table in metadata.sorted_tables]
+    plain_json = set(connection.execute(
+        text(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name IN :tables AND data_type = 'json'"
+        ).bindparams(bindparam("tables", expanding=True)),
+        {"tables": tables}
+    ).tuples())
+    return [
+        column for table in metadata.sorted_tables for column in table.columns
+        if isinstance(column.type, JSONB) and (table.name, column.name) in plain_json
+    ]
+
+def _convert_to_jsonb(connection, column: Column):
+    """ALTER an existing json column to jsonb, rewriting the table"""
+    preparer = connection.dialect.identifier_preparer
+    name = preparer.format_column(column)
+    connection.execute(text(
+        f"ALTER TABLE {preparer.format_table(column.table)} "
+        f"ALTER COLUMN {name} TYPE jsonb USING {name}::jsonb"
+    ))
+    logging.info(f"✅ Converted {column.table.name}.{column.name} to jsonb")
+
+def _set_default(connection, column: Column):
+    """ALTER an existing column to the server_default its model declares"""
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    default = dialect.ddl_compiler(dialect, None).get_column_default_string(column)
+    connection.execute(text(
+        f"ALTER TABLE {preparer.format_table(column.table)} "
+        f"ALTER COLUMN {preparer.format_column(column)} SET DEFAULT {default}"
+    ))
+    logging.info(f"✅ Set default on {column.table.name}.{column.name}")
+
+def ensure_schema(bind, metadata) -> bool:
+    """Bring the database up to metadata: missing tables, indexes, defaults and jsonb types
+
+    A table-name listing plus one pg_indexes and three information_schema
+    queries replace create_all()'s per-table reflection on every worker boot. When something is missing,
+    workers booting together serialize on an advisory lock and re-check, so
+    only the first builds it. Returns True if create_all() ran.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return ensure_schema(connection, metadata)
+    
+    def tables_missing():
+        existing = set(inspect(bind).get_table_names())
+        return not all(table.name in existing for table in metadata.sorted_tables)
+    
+    if (not tables_missing() and not _json_columns(bind, metadata)
+            and not _missing_indexes(bind, metadata) and not _missing_defaults(bind, metadata)):
+        return False
+    
+    bind.execute(text("SELECT pg_advisory_xact_lock(hashtext('ensure_schema'))"))
+    # Index builds on populated tables can outlast the pooled statement_timeout
+    bind.execute(text("SET LOCAL statement_timeout = 0"))
+    created = tables_missing()
+    if created:
+        metadata.create_all(bind)
+    # Before the indexes: the GIN ones need jsonb
+    for column in _json_columns(bind, metadata):
+        _convert_to_jsonb(bind, column)
+    for index in _missing_indexes(bind, metadata):
+        index.create(bind)
+        logging.info(f"✅ Created index {index.name}")
+    for column in _missing_defaults(bind, metadata):
+        _set_default(bind, column)
+    return created
+
+def remove_session(exception=None):
+    """Discard the current thread's session at the end of a request"""
+    if Session is not None:
+        Session.remove()
 
 # Initialize database connection lazily
 def initialize_database():
     """Initialize database connection - called lazily when needed"""
+    global engine, Session, connected, _initialize_attempted
+    
+    if connected:
+        return True
+    with _initialize_lock:
+        _initialize_attempted = True
+        return _connect_database()
+
+def _connect_database():
+    """Create the engine and session factory; callers hold _initialize_lock"""
     global engine, Session, connected
     
     if DATABASE_URL and not connected:
@@ -26,24 +237,15 @@ def initialize_database():
             logging.info("Attempting database connection using DATABASE_URL")
             
             # Create the SQLAlchemy engine with optimized settings for Supabase
-            engine = create_engine(
-                DATABASE_URL,
-                poolclass=NullPool,  # Recommended for Supabase pooling
-                pool_pre_ping=True,
-                connect_args={
-                    "sslmode": "require",
-                    "connect_timeout": 5,  # Reduced timeout
-                    "application_name": "VeroctaAI-Backend"
-                }
-            )
+            engine = create_engine(DATABASE_URL, **engine_options(connect_timeout=5))
             
             # Test the connection with timeout
             with engine.connect() as connection:
                 result = connection.execute(text("SELECT 1"))
                 logging.info("✅ Database connection established and tested successfully")
             
-            # Create session maker
-            Session = sessionmaker(bind=engine)
+            # Thread-local sessions; loaded attributes stay usable after commit
+            Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
             connected = True
             return True
             
@@ -61,7 +263,7 @@ def initialize_database():
 
 def test_connection():
     """Test database connection - required for health checks"""
-    global engine, connected
+    global engine, Session, connected
     
     if not DATABASE_URL:
         return False
@@ -69,16 +271,8 @@ def test_connection():
     try:
         if engine is None:
             # Try to recreate engine
-            engine = create_engine(
-                DATABASE_URL,
-                poolclass=NullPool,
-                pool_pre_ping=True,
-                connect_args={
-                    "sslmode": "require",
-                    "connect_timeout": 10,
-                    "application_name": "VeroctaAI-Backend"
-                }
-            )
+            engine = create_engine(DATABASE_URL, **engine_options(connect_timeout=10))
+            Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
         
         with engine.connect() as connection:
             connection.execute(text("SELECT 1"))
@@ -93,6 +287,10 @@ def test_connection():
 # Define database models
 Base = declarative_base()
 
+# Naive UTC timestamp from the server clock, comparable with datetime.utcnow();
+# plain now() would follow the session TimeZone
+utc_now = func.timezone('utc', func.now())
+
 class User(Base):
     __tablename__ = 'users'
     
@@ -101,9 +299,11 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     role = Column(String, default='user')
     company = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
     is_active = Column(Boolean, default=True)
+    # Fetch server-generated timestamps through RETURNING on flush
+    __mapper_args__ = {'eager_defaults': True}
 
 class Report(Base):
     __tablename__ = 'reports'
@@ -113,12 +313,28 @@ class Report(Base):
     title = Column(String, nullable=False)
     company = Column(String)
     spend_score = Column(Integer)
-    data = Column(JSON)
-    insights = Column(JSON)
-    analysis = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Large JSON payloads load only when asked for with undefer_group('blobs')
+    data = deferred(Column(JSONB), group='blobs')
+    insights = deferred(Column(JSONB), group='blobs')
+    analysis = deferred(Column(JSONB), group='blobs')
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
     status = Column(String, default='completed')
+    # Same names as setup_supabase_tables.py so create_all() and the SQL bundle agree
+    __table_args__ = (
+        Index('reports_user_created_idx', 'user_id', created_at.desc()),
+        # Containment lookups (data @> '{...}'); jsonb_path_ops keeps the index small
+        Index('reports_data_gin_idx', 'data', postgresql_using='gin', postgresql_ops={'data': 'jsonb_path_ops'}),
+    )
+    # Insight rows for this report; `insights` above is the report's own JSON
+    # summary. There is no FK in the model, so the join is declared explicitly.
+    detailed_insights = relationship(
+        'Insight',
+        primaryjoin='foreign(Insight.report_id) == Report.id',
+        order_by='Insight.created_at',
+        viewonly=True,
+        lazy='select'
+    )
 
 class Insight(Base):
     __tablename__ = 'insights'
@@ -126,32 +342,104 @@ class Insight(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("uuid_generate_v4()"))
     report_id = Column(UUID(as_uuid=True), nullable=False)
     user_id = Column(UUID(as_uuid=True), nullable=False)
-    ai_insights = Column(JSON)
-    recommendations = Column(JSON)
-    waste_percentage = Column(DECIMAL(5,2))
+    ai_insights = Column(JSONB)
+    recommendations = Column(JSONB)
+    # NUMERIC(5,2) in Postgres, handed to Python as float
+    waste_percentage = Column(Numeric(5, 2, asdecimal=False))
     duplicate_expenses = Column(Integer, default=0)
     spending_spikes = Column(Integer, default=0)
     savings_opportunities = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    
+    __table_args__ = (
+        Index('insights_report_user_idx', 'report_id', 'user_id'),
+        Index('insights_user_idx', 'user_id'),
+    )
+
+# Read-only materialized view from setup_supabase_tables.py, refreshed nightly;
+# never part of create_all()
+user_weekly_summary = Table(
+    'user_weekly_summary', MetaData(),
+    Column('user_id', UUID(as_uuid=True), primary_key=True),
+    Column('reports_7d', Integer),
+    Column('score_7d', Numeric(asdecimal=False)),
+    Column('total_7d', Numeric(asdecimal=False)),
+    Column('last_report', DateTime)
+)
+
+def _user_to_dict(user: User) -> Dict:
+    """Serialize a User row"""
+    return {
+        'id': str(user.id),
+        'email': user.email,
+        'password_hash': user.password_hash,
+        'role': user.role,
+        'company': user.company,
+        'created_at': user.created_at.isoformat() if user.created_at is not None else None,
+        'is_active': user.is_active
+    }
+
+# Report columns fetched as plain rows when no ORM relationships are needed
+_REPORT_SUMMARY_COLUMNS = (
+    Report.id, Report.user_id, Report.title, Report.company, Report.spend_score,
+    Report.created_at, Report.status
+)
+_REPORT_COLUMNS = _REPORT_SUMMARY_COLUMNS + (Report.data, Report.insights, Report.analysis)
+
+def _report_row_to_dict(row) -> Dict:
+    """Turn a _REPORT_COLUMNS mapping into a report dict
+
+    Ids are strings, as from the create paths and the in-memory fallback.
+    """
+    report_dict = dict(row)
+    report_dict['id'] = str(report_dict['id'])
+    report_dict['user_id'] = str(report_dict['user_id'])
+    created_at = report_dict['created_at']
+    report_dict['created_at'] = created_at.isoformat() if created_at else None
+    return report_dict
+
+def _insight_to_dict(insight: Insight) -> Dict:
+    """Serialize an Insight row"""
+    return {
+        'id': str(insight.id),
+        'report_id': str(insight.report_id),
+        'user_id': str(insight.user_id),
+        'ai_insights': insight.ai_insights,
+        'recommendations': insight.recommendations,
+        'waste_percentage': insight.waste_percentage or 0,
+        'duplicate_expenses': insight.duplicate_expenses,
+        'spending_spikes': insight.spending_spikes,
+        'savings_opportunities': insight.savings_opportunities,
+        'created_at': insight.created_at.isoformat() if insight.created_at else None
+    }
 
 class DatabaseService:
-    """Database service for VeroctaAI using SQLAlchemy"""
+    """Database service for VeroctaAI using SQLAlchemy
+
+    User lookups are not cached here: auth keeps the only in-process user
+    cache (JWT_USER_CACHE_TTL), so role and active-status changes apply
+    within its TTL.
+    """
+    
+    # The engine and session factory live at module level; these expose them
+    # to callers that only hold db_service
+    @property
+    def connected(self) -> bool:
+        return connected
+    
+    @property
+    def engine(self):
+        return engine
     
-    def __init__(self):
-        self.connected = False
-        self.engine = None
-        self.Session = None
-        self._initialize_attempted = False
+    @property
+    def Session(self):
+        return Session
     
     def _ensure_connected(self):
         """Ensure database is connected before operations"""
-        if not self._initialize_attempted:
-            self._initialize_attempted = True
-            if initialize_database():
-                self.connected = connected
-                self.engine = engine 
-                self.Session = Session
-        return self.connected
+        if connected or _initialize_attempted:
+            return connected
+        return initialize_database()
         
     def create_tables_if_not_exist(self):
         """Create tables if they don't exist"""
@@ -160,8 +448,8 @@ class DatabaseService:
             return
             
         try:
-            # Create all tables
-            Base.metadata.create_all(self.engine)
+            if ensure_schema(engine, Base.metadata):
+                logging.info("Database schema created")
             logging.info("Database schema ready")
             
         except Exception as e:
@@ -169,223 +457,262 @@ class DatabaseService:
     
     def get_user_by_email(self, email: str) -> Optional[Dict]:
         """Get user by email from database"""
-        if not self._ensure_connected() or not self.Session:
+        if not self._ensure_connected():
             return None
             
         try:
-            session = self.Session()
-            user = session.query(User).filter(User.email == email).first()
-            session.close()
+            with Session() as session:
+                user = session.query(User).filter(User.email == email).first()
             
-            if user:
-                return {
-                    'id': str(user.id),
-                    'email': user.email,
-                    'password_hash': user.password_hash,
-                    'role': user.role,
-                    'company': user.company,
-                    'created_at': user.created_at.isoformat() if user.created_at is not None else None,
-                    'is_active': user.is_active
-                }
-            return None
+                if user:
+                    return _user_to_dict(user)
+                return None
         except Exception as e:
             logging.error(f"Error fetching user: {str(e)}")
             return None
     
+    def get_users_by_email(self, emails: List[str]) -> Dict[str, Dict]:
+        """Get several users by email in a single query"""
+        if not emails or not self._ensure_connected():
+            return {}
+            
+        try:
+            with Session() as session:
+                users = session.query(User).filter(User.email.in_(emails)).all()
+                return {user.email: _user_to_dict(user) for user in users}
+        except Exception as e:
+            logging.error(f"Error fetching users: {str(e)}")
+            return {}
+    
     def create_user(self, email: str, password_hash: str, company: str = None, role: str = "user") -> Optional[Dict]:
         """Create new user in database"""
-        if not self._ensure_connected() or not self.Session:
+        if not self._ensure_connected():
             return None
             
         try:
-            session = self.Session()
-            
-            new_user = User(
-                email=email,
-                password_hash=password_hash,
-                company=company or 'Default Company',
-                role=role,
-                is_active=True
-            )
-            
-            session.add(new_user)
-            session.commit()
-            
-            user_dict = {
-                'id': str(new_user.id),
-                'email': new_user.email,
-                'password_hash': new_user.password_hash,
-                'role': new_user.role,
-                'company': new_user.company,
-                'created_at': new_user.created_at.isoformat() if new_user.created_at is not None else None,
-                'is_active': new_user.is_active
-            }
+            with Session() as session:
+                new_user = User(
+                    email=email,
+                    password_hash=password_hash,
+                    company=company or 'Default Company',
+                    role=role,
+                    is_active=True
+                )
+            
+                session.add(new_user)
+                # The INSERT returns the generated id; reading it before commit
+                # avoids the refresh SELECT an expired instance would need
+                session.flush()
+            
+                user_dict = _user_to_dict(new_user)
             
-            session.close()
-            return user_dict
+                session.commit()
+                return user_dict
         except Exception as e:
             logging.error(f"Error creating user: {str(e)}")
             return None
     
-    def create_report(self, user_id: str, title: str, company: str, data: Dict, 
-                     spend_score: Optional[int] = None, insights: Optional[Dict] = None, analysis: Optional[Dict] = None) -> Optional[Dict]:
-        """Create new report in database"""
-        if not self._ensure_connected() or not self.Session:
-            return None
+    def update_user_password(self, email: str, password_hash: str) -> bool:
+        """Replace a user's password hash"""
+        if not self._ensure_connected():
+            return False
             
         try:
-            session = self.Session()
-            
-            new_report = Report(
-                user_id=user_id,
-                title=title,
-                company=company,
-                spend_score=spend_score,
-                data=data,
-                insights=insights or {},
-                analysis=analysis or {},
-                status='completed'
-            )
-            
-            session.add(new_report)
-            session.commit()
-            
-            report_dict = {
-                'id': str(new_report.id),
-                'user_id': str(new_report.user_id),
-                'title': new_report.title,
-                'company': new_report.company,
-                'spend_score': new_report.spend_score,
-                'data': new_report.data,
-                'insights': new_report.insights,
-                'analysis': new_report.analysis,
-                'created_at': new_report.created_at.isoformat() if new_report.created_at is not None else None,
-                'status': new_report.status
-            }
-            
-            session.close()
-            return report_dict
+            with Session() as session:
+                updated = session.query(User).filter(User.email == email).update(
+                    {User.password_hash: password_hash}
+                )
+                session.commit()
+                return updated > 0
         except Exception as e:
-            logging.error(f"Error creating report: {str(e)}")
-            return None
+            logging.error(f"Error updating password: {str(e)}")
+            return False
     
-    def get_user_reports(self, user_id: str, limit: int = 50) -> List[Dict]:
-        """Get user reports from database"""
-        if not self._ensure_connected():
+    def create_report(self, user_id: str, title: str, company: str, data: Dict, 
+                     spend_score: Optional[int] = None, insights: Optional[Dict] = None, analysis: Optional[Dict] = None) -> Optional[Dict]:
+        """Create new report in database"""
+        reports = self.create_reports_bulk([{
+            'user_id': user_id,
+            'title': title,
+            'company': company,
+            'data': data,
+            'spend_score': spend_score,
+            'insights': insights,
+            'analysis': analysis
+        }])
+        return reports[0] if reports else None
+    
+    def create_reports_bulk(self, rows: List[Dict]) -> List[Dict]:
+        """Create several reports with one batched INSERT ... RETURNING"""
+        if not rows or not self._ensure_connected():
             return []
             
         try:
-            session = self.Session()
-            reports = session.query(Report).filter(Report.user_id == user_id).order_by(Report.created_at.desc()).limit(limit).all()
-            
-            reports_list = []
-            for report in reports:
-                reports_list.append({
+            with Session() as session:
+                # Every row carries the same keys so the batch isn't split by shape
+                values = [{
+                    'user_id': row['user_id'],
+                    'title': row['title'],
+                    'company': row.get('company'),
+                    'spend_score': row.get('spend_score'),
+                    'data': row.get('data'),
+                    'insights': row.get('insights') or {},
+                    'analysis': row.get('analysis') or {},
+                    'status': row.get('status', 'completed')
+                } for row in rows]
+            
+                # RETURNING leaves out the deferred JSON columns; rows come back
+                # in parameter order, so those are taken from the input values
+                new_reports = session.scalars(
+                    insert(Report).returning(Report, sort_by_parameter_order=True).execution_options(render_nulls=True),
+                    values
+                ).all()
+            
+                reports_list = [{
                     'id': str(report.id),
                     'user_id': str(report.user_id),
                     'title': report.title,
                     'company': report.company,
                     'spend_score': report.spend_score,
-                    'data': report.data,
-                    'insights': report.insights,
-                    'analysis': report.analysis,
-                    'created_at': report.created_at.isoformat() if report.created_at else None,
+                    'data': value['data'],
+                    'insights': value['insights'],
+                    'analysis': value['analysis'],
+                    'created_at': report.created_at.isoformat() if report.created_at is not None else None,
                     'status': report.status
-                })
+                } for report, value in zip(new_reports, values)]
             
-            session.close()
-            return reports_list
+                session.commit()
+                return reports_list
         except Exception as e:
-            logging.error(f"Error fetching reports: {str(e)}")
+            logging.error(f"Error creating report: {str(e)}")
             return []
     
-    def get_report_by_id(self, report_id: str, user_id: str = None) -> Optional[Dict]:
-        """Get specific report by ID"""
+    def get_user_reports(self, user_id: str, limit: int = 50, include_insights: bool = False,
+                         include_data: bool = True) -> List[Dict]:
+        """Get user reports from database, optionally with their insight rows
+
+        include_data=False leaves out the data/insights/analysis JSON for list views.
+        """
         if not self._ensure_connected():
-            return None
+            return []
             
         try:
-            session = self.Session()
-            query = session.query(Report).filter(Report.id == report_id)
-            if user_id:
-                query = query.filter(Report.user_id == user_id)
-            
-            report = query.first()
-            session.close()
-            
-            if report:
-                return {
-                    'id': str(report.id),
-                    'user_id': str(report.user_id),
-                    'title': report.title,
-                    'company': report.company,
-                    'spend_score': report.spend_score,
-                    'data': report.data,
-                    'insights': report.insights,
-                    'analysis': report.analysis,
-                    'created_at': report.created_at.isoformat() if report.created_at else None,
-                    'status': report.status
-                }
-            return None
+            with Session() as session:
+                if not include_insights:
+                    # Core rows skip ORM instance construction and the identity map
+                    stmt = (
+                        select(*(_REPORT_COLUMNS if include_data else _REPORT_SUMMARY_COLUMNS))
+                        .where(Report.user_id == user_id)
+                        .order_by(Report.created_at.desc())
+                        .limit(limit)
+                    )
+                    rows = session.execute(stmt).mappings()
+                    return [_report_row_to_dict(row) for row in rows]
+            
+                # One extra SELECT ... IN for all reports instead of one per report
+                query = session.query(Report).options(selectinload(Report.detailed_insights))
+                if include_data:
+                    query = query.options(undefer_group('blobs'))
+                reports = (
+                    query
+                    .filter(Report.user_id == user_id)
+                    .order_by(Report.created_at.desc())
+                    .limit(limit)
+                    .all()
+                )
+            
+                reports_list = []
+                for report in reports:
+                    columns = _REPORT_COLUMNS if include_data else _REPORT_SUMMARY_COLUMNS
+                    report_dict = _report_row_to_dict({column.key: getattr(report, column.key) for column in columns})
+                    report_dict['detailed_insights'] = [_insight_to_dict(i) for i in report.detailed_insights]
+                    reports_list.append(report_dict)
+            
+                return reports_list
         except Exception as e:
-            logging.error(f"Error fetching report: {str(e)}")
-            return None
+            logging.error(f"Error fetching reports: {str(e)}")
+            return []
     
-    def save_insights(self, report_id: str, user_id: str, ai_insights: Dict, 
-                     recommendations: List[str], metrics: Dict) -> Optional[Dict]:
-        """Save AI insights to database"""
+    def get_report_by_id(self, report_id: str, user_id: str = None, include_insights: bool = False) -> Optional[Dict]:
+        """Get specific report by ID, optionally with its insight rows"""
         if not self._ensure_connected():
             return None
             
         try:
-            session = self.Session()
-            
-            new_insight = Insight(
-                report_id=report_id,
-                user_id=user_id,
-                ai_insights=ai_insights,
-                recommendations=recommendations,
-                waste_percentage=metrics.get('waste_percentage', 0),
-                duplicate_expenses=metrics.get('duplicate_expenses', 0),
-                spending_spikes=metrics.get('spending_spikes', 0),
-                savings_opportunities=metrics.get('savings_opportunities', 0)
-            )
-            
-            session.add(new_insight)
-            session.commit()
-            
-            insight_dict = {
-                'id': str(new_insight.id),
-                'report_id': str(new_insight.report_id),
-                'user_id': str(new_insight.user_id),
-                'ai_insights': new_insight.ai_insights,
-                'recommendations': new_insight.recommendations,
-                'waste_percentage': float(new_insight.waste_percentage) if new_insight.waste_percentage else 0,
-                'duplicate_expenses': new_insight.duplicate_expenses,
-                'spending_spikes': new_insight.spending_spikes,
-                'savings_opportunities': new_insight.savings_opportunities,
-                'created_at': new_insight.created_at.isoformat() if new_insight.created_at else None
-            }
-            
-            session.close()
-            return insight_dict
+            with Session() as session:
+                if not include_insights:
+                    stmt = select(*_REPORT_COLUMNS).where(Report.id == report_id)
+                    if user_id:
+                        stmt = stmt.where(Report.user_id == user_id)
+                    row = session.execute(stmt.limit(1)).mappings().first()
+                    return _report_row_to_dict(row) if row else None
+            
+                query = session.query(Report).filter(Report.id == report_id).options(
+                    selectinload(Report.detailed_insights), undefer_group('blobs')
+                )
+                if user_id:
+                    query = query.filter(Report.user_id == user_id)
+            
+                report = query.first()
+            
+                if report:
+                    report_dict = _report_row_to_dict({column.key: getattr(report, column.key) for column in _REPORT_COLUMNS})
+                    report_dict['detailed_insights'] = [_insight_to_dict(i) for i in report.detailed_insights]
+                    return report_dict
+                return None
         except Exception as e:
-            logging.error(f"Error saving insights: {str(e)}")
+            logging.error(f"Error fetching report: {str(e)}")
             return None
     
-    def get_next_user_id(self) -> int:
-        """Get next available user ID"""
-        if not self._ensure_connected():
-            return 1
+    def save_insights(self, report_id: str, user_id: str, ai_insights: Dict, 
+                     recommendations: List[str], metrics: Union[Dict, List[Dict]]) -> Optional[Dict]:
+        """Save AI insights to database
+
+        metrics may be a list of metric slices; each becomes its own insight row,
+        all written in one batched INSERT, and the first row is returned.
+        """
+        metrics_list = metrics if isinstance(metrics, list) else [metrics]
+        insights = self.save_insights_bulk([{
+            'report_id': report_id,
+            'user_id': user_id,
+            'ai_insights': ai_insights,
+            'recommendations': recommendations,
+            'metrics': slice_metrics
+        } for slice_metrics in metrics_list])
+        return insights[0] if insights else None
+    
+    def save_insights_bulk(self, rows: List[Dict]) -> List[Dict]:
+        """Save several insight rows with one batched INSERT ... RETURNING, in input order"""
+        if not rows or not self._ensure_connected():
+            return []
             
         try:
-            session = self.Session()
-            count = session.query(User).count()
-            session.close()
-            return count + 1
+            with Session() as session:
+                values = []
+                for row in rows:
+                    metrics = row.get('metrics') or {}
+                    values.append({
+                        'report_id': row['report_id'],
+                        'user_id': row['user_id'],
+                        'ai_insights': row.get('ai_insights'),
+                        'recommendations': row.get('recommendations'),
+                        'waste_percentage': metrics.get('waste_percentage', 0),
+                        'duplicate_expenses': metrics.get('duplicate_expenses', 0),
+                        'spending_spikes': metrics.get('spending_spikes', 0),
+                        'savings_opportunities': metrics.get('savings_opportunities', 0)
+                    })
+            
+                new_insights = session.scalars(
+                    insert(Insight).returning(Insight, sort_by_parameter_order=True).execution_options(render_nulls=True),
+                    values
+                ).all()
+                insights_list = [_insight_to_dict(insight) for insight in new_insights]
+            
+                session.commit()
+                return insights_list
         except Exception as e:
-            logging.error(f"Error getting next user ID: {str(e)}")
-            return 1
+            logging.error(f"Error saving insights: {str(e)}")
+            return []
     
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Get user by ID from database"""
@@ -393,42 +720,49 @@ class DatabaseService:
             return None
             
         try:
-            session = self.Session()
-            user = session.query(User).filter(User.id == user_id).first()
-            session.close()
+            with Session() as session:
+                user = session.query(User).filter(User.id == user_id).first()
             
-            if user:
-                return {
-                    'id': str(user.id),
-                    'email': user.email,
-                    'password_hash': user.password_hash,
-                    'role': user.role,
-                    'company': user.company,
-                    'created_at': user.created_at.isoformat() if user.created_at else None,
-                    'is_active': user.is_active
-                }
-            return None
+                if user:
+                    return _user_to_dict(user)
+                return None
         except Exception as e:
             logging.error(f"Error fetching user by ID: {str(e)}")
             return None
 
+    def get_weekly_summary(self, user_id: str) -> Optional[Dict]:
+        """Get the user's last-7-days roll-up from the user_weekly_summary view"""
+        if not self._ensure_connected():
+            return None
+            
+        try:
+            with Session() as session:
+                row = session.execute(
+                    select(user_weekly_summary).where(user_weekly_summary.c.user_id == user_id)
+                ).mappings().first()
+                if not row:
+                    return None
+                summary = dict(row)
+                summary['user_id'] = str(summary['user_id'])
+                summary['last_report'] = summary['last_report'].isoformat() if summary['last_report'] else None
+                return summary
+        except Exception as e:
+            logging.error(f"Error fetching weekly summary: {str(e)}")
+            return None
+
     def delete_report(self, report_id: str, user_id: str) -> bool:
         """Delete a report by ID for a specific user"""
         if not self._ensure_connected():
             return False
             
         try:
-            session = self.Session()
-            report = session.query(Report).filter(Report.id == report_id, Report.user_id == user_id).first()
-            
-            if report:
-                session.delete(report)
+            with Session() as session:
+                # Single round trip; rowcount tells us whether the report existed
+                result = session.execute(
+                    delete(Report).where(Report.id == report_id, Report.user_id == user_id)
+                )
                 session.commit()
-                session.close()
-                return True
-            
-            session.close()
-            return False
+                return result.rowcount > 0
             
         except Exception as e:
             logging.error(f"Error deleting report: {str(e)}")
@@ -445,41 +779,41 @@ class DatabaseService:
             }
             
         try:
-            session = self.Session()
-            
-            # Get reports
-            reports = session.query(Report).filter(Report.user_id == user_id).all()
-            total_reports = len(reports)
+            with Session() as session:
+                # Aggregate in Postgres in one round trip instead of loading every
+                # report and insight row (and its JSON blobs) into Python
+                report_stats = select(
+                    func.count(Report.id).label('total_reports'),
+                    func.coalesce(func.avg(func.coalesce(Report.spend_score, 0)), 0).label('avg_spend_score'),
+                    func.coalesce(func.sum(Report.data['total_amount'].as_float()), 0).label('total_amount')
+                ).where(Report.user_id == user_id).subquery()
+                avg_waste = select(
+                    func.round(func.coalesce(func.avg(func.coalesce(Insight.waste_percentage, 0)), 0), 1)
+                ).where(Insight.user_id == user_id).scalar_subquery()
+            
+                stats = session.execute(select(report_stats, avg_waste.label('avg_waste_percentage'))).one()
+            
+                total_reports = stats.total_reports
+                if total_reports == 0:
+                    return {
+                        'total_reports': 0,
+                        'avg_spend_score': 0,
+                        'total_savings': 0,
+                        'avg_waste_percentage': 0
+                    }
+            
+                avg_spend_score = float(stats.avg_spend_score)
+                # Estimate savings as 15% of the total amount
+                total_savings = float(stats.total_amount) * 0.15
+                avg_waste_percentage = float(stats.avg_waste_percentage)
             
-            if total_reports == 0:
-                session.close()
                 return {
-                    'total_reports': 0,
-                    'avg_spend_score': 0,
-                    'total_savings': 0,
-                    'avg_waste_percentage': 0
+                    'total_reports': total_reports,
+                    'avg_spend_score': int(avg_spend_score),
+                    'total_savings': int(total_savings),
+                    'avg_waste_percentage': avg_waste_percentage
                 }
             
-            # Calculate average spend score
-            avg_spend_score = sum(r.spend_score or 0 for r in reports) / total_reports
-            
-            # Calculate total savings (estimate 15% of total amount)
-            total_amount = sum(r.data.get('total_amount', 0) if r.data else 0 for r in reports)
-            total_savings = total_amount * 0.15
-            
-            # Get insights for waste percentage
-            insights = session.query(Insight).filter(Insight.user_id == user_id).all()
-            avg_waste_percentage = sum(float(i.waste_percentage) if i.waste_percentage else 0 for i in insights) / max(len(insights), 1)
-            
-            session.close()
-            
-            return {
-                'total_reports': total_reports,
-                'avg_spend_score': int(avg_spend_score),
-                'total_savings': int(total_savings),
-                'avg_waste_percentage': round(avg_waste_percentage, 1)
-            }
-            
         except Exception as e:
             logging.error(f"Error fetching dashboard stats: {str(e)}")
             return {
@@ -1,22 +1,30 @@
 import os
 import logging
-import uuid
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Boolean, JSON, DECIMAL, ForeignKey, Text, BigInteger
+import itertools
+import threading
+from typing import Dict, Iterable, List, Any, Optional
+from sqlalchemy import create_engine, select, text, Column, String, Integer, DateTime, Boolean, DECIMAL, ForeignKey, Text, BigInteger, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import joinedload, relationship, scoped_session, selectinload, sessionmaker
+from sqlalchemy.dialects.postgresql import JSONB, UUID, insert as pg_insert
 import json
+from .database import engine_options, ensure_schema, utc_now
 
 # Enhanced Database Models for Complete SaaS Platform
 Base = declarative_base()
 
+# system_settings key marking that create_all_tables has run against this database
+SCHEMA_SEED_KEY = 'schema_seeded_v1'
+
+# Set DB_RAISE_ON_LAZY_LOAD=true in development to turn any relationship lazy
+# load (an N+1 in a serialization loop) into an error; read paths should use
+# selectinload/joinedload as get_reports_with_insights does
+RELATIONSHIP_LAZY = "raise_on_sql" if os.getenv("DB_RAISE_ON_LAZY_LOAD", "false").lower() in ("1", "true", "yes") else "select"
+
 class User(Base):
     __tablename__ = 'users'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     email = Column(String(255), unique=True, nullable=False, index=True)
     password_hash = Column(String(255), nullable=False)
     first_name = Column(String(100))
@@ -30,8 +38,8 @@ class User(Base):
     timezone = Column(String(100), default='UTC')
     currency = Column(String(10), default='USD')
     phone = Column(String(50))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
     last_login = Column(DateTime)
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
@@ -40,15 +48,15 @@ class User(Base):
     reset_token_expires = Column(DateTime)
     
     # Relationships
-    reports = relationship("Report", back_populates="user")
-    subscriptions = relationship("Subscription", back_populates="user")
-    insights = relationship("Insight", back_populates="user")
-    audit_logs = relationship("AuditLog", back_populates="user")
+    reports = relationship("Report", back_populates="user", lazy=RELATIONSHIP_LAZY)
+    subscriptions = relationship("Subscription", back_populates="user", lazy=RELATIONSHIP_LAZY)
+    insights = relationship("Insight", back_populates="user", lazy=RELATIONSHIP_LAZY)
+    audit_logs = relationship("AuditLog", back_populates="user", lazy=RELATIONSHIP_LAZY)
 
 class Subscription(Base):
     __tablename__ = 'subscriptions'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     stripe_subscription_id = Column(String(255), unique=True)
     stripe_price_id = Column(String(255))
@@ -60,16 +68,16 @@ class Subscription(Base):
     current_period_start = Column(DateTime)
     current_period_end = Column(DateTime)
     cancel_at_period_end = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
     
     # Relationships
-    user = relationship("User", back_populates="subscriptions")
+    user = relationship("User", back_populates="subscriptions", lazy=RELATIONSHIP_LAZY)
 
 class Report(Base):
     __tablename__ = 'reports'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     title = Column(String(255), nullable=False)
     company = Column(String(255))
@@ -83,30 +91,38 @@ class Report(Base):
     date_range_start = Column(DateTime)
     date_range_end = Column(DateTime)
     categories_count = Column(Integer)
-    data = Column(JSON)  # Raw financial data
-    analysis = Column(JSON)  # Processed analysis
-    insights = Column(JSON)  # AI-generated insights
-    recommendations = Column(JSON)  # Action recommendations
+    data = Column(JSONB)  # Raw financial data
+    analysis = Column(JSONB)  # Processed analysis
+    insights = Column(JSONB)  # AI-generated insights
+    recommendations = Column(JSONB)  # Action recommendations
     status = Column(String(50), default='processing')  # processing, completed, failed
     processing_time = Column(DECIMAL(5, 2))  # Time in seconds
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
     
     # Relationships
-    user = relationship("User", back_populates="reports")
-    detailed_insights = relationship("Insight", back_populates="report")
+    user = relationship("User", back_populates="reports", lazy=RELATIONSHIP_LAZY)
+    detailed_insights = relationship("Insight", back_populates="report", lazy=RELATIONSHIP_LAZY)
+    
+    # Index names match database.py's models, which map the same tables
+    __table_args__ = (
+        Index('reports_user_created_idx', 'user_id', created_at.desc()),
+        # Same GIN index database.py declares on data, plus one on analysis
+        Index('reports_data_gin_idx', 'data', postgresql_using='gin', postgresql_ops={'data': 'jsonb_path_ops'}),
+        Index('reports_analysis_gin_idx', 'analysis', postgresql_using='gin', postgresql_ops={'analysis': 'jsonb_path_ops'}),
+    )
 
 class Insight(Base):
     __tablename__ = 'insights'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     report_id = Column(UUID(as_uuid=True), ForeignKey('reports.id'), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     insight_type = Column(String(100))  # waste_detection, trend_analysis, forecasting, etc.
     title = Column(String(255))
     description = Column(Text)
-    ai_insights = Column(JSON)
-    recommendations = Column(JSON)
+    ai_insights = Column(JSONB)
+    recommendations = Column(JSONB)
     waste_percentage = Column(DECIMAL(5, 2))
     potential_savings = Column(DECIMAL(15, 2))
     duplicate_expenses = Column(Integer, default=0)
@@ -116,101 +132,123 @@ class Insight(Base):
     priority = Column(String(20), default='medium')  # low, medium, high, critical
     is_implemented = Column(Boolean, default=False)
     implementation_notes = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
     
     # Relationships
-    report = relationship("Report", back_populates="detailed_insights")
-    user = relationship("User", back_populates="insights")
+    report = relationship("Report", back_populates="detailed_insights", lazy=RELATIONSHIP_LAZY)
+    user = relationship("User", back_populates="insights", lazy=RELATIONSHIP_LAZY)
+    
+    __table_args__ = (
+        Index('insights_report_user_idx', 'report_id', 'user_id'),
+        Index('insights_user_type_idx', 'user_id', 'insight_type'),
+    )
 
 class Category(Base):
     __tablename__ = 'categories'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     name = Column(String(100), nullable=False)
     description = Column(Text)
     icon = Column(String(100))
     color = Column(String(20))
     parent_category_id = Column(UUID(as_uuid=True), ForeignKey('categories.id'))
     is_system = Column(Boolean, default=True)  # System vs user-defined
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    
+    # System category names are unique; user-defined ones may repeat across users
+    __table_args__ = (
+        Index('categories_system_name_idx', 'name', unique=True, postgresql_where=text('is_system')),
+    )
 
 class Integration(Base):
     __tablename__ = 'integrations'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     integration_type = Column(String(100), nullable=False)  # google_sheets, quickbooks, xero
     provider_id = Column(String(255))  # External system ID
-    credentials = Column(JSON)  # Encrypted credentials
-    configuration = Column(JSON)  # Integration settings
+    credentials = Column(JSONB)  # Encrypted credentials
+    configuration = Column(JSONB)  # Integration settings
     sync_frequency = Column(String(50), default='daily')  # manual, daily, weekly, monthly
     last_sync = Column(DateTime)
     next_sync = Column(DateTime)
     status = Column(String(50), default='active')  # active, error, disabled
     error_message = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
 
 class AuditLog(Base):
     __tablename__ = 'audit_logs'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'))
     action = Column(String(100), nullable=False)  # login, logout, create_report, etc.
     resource_type = Column(String(100))  # user, report, subscription, etc.
     resource_id = Column(String(255))
     ip_address = Column(String(45))
     user_agent = Column(Text)
-    details = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    details = Column(JSONB)
+    created_at = Column(DateTime, server_default=utc_now)
     
     # Relationships
-    user = relationship("User", back_populates="audit_logs")
+    user = relationship("User", back_populates="audit_logs", lazy=RELATIONSHIP_LAZY)
+    
+    __table_args__ = (
+        Index('audit_logs_user_created_idx', 'user_id', 'created_at'),
+        # Default jsonb_ops so details ? 'key' existence filters can use it too
+        Index('audit_logs_details_gin_idx', 'details', postgresql_using='gin'),
+    )
 
 class EmailTemplate(Base):
     __tablename__ = 'email_templates'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     name = Column(String(100), nullable=False, unique=True)
     subject = Column(String(255), nullable=False)
     html_content = Column(Text, nullable=False)
     text_content = Column(Text)
-    variables = Column(JSON)  # Template variables schema
+    variables = Column(JSONB)  # Template variables schema
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
 
 class EmailQueue(Base):
     __tablename__ = 'email_queue'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     to_email = Column(String(255), nullable=False)
     from_email = Column(String(255))
     subject = Column(String(255), nullable=False)
     html_content = Column(Text)
     text_content = Column(Text)
     template_name = Column(String(100))
-    template_data = Column(JSON)
+    template_data = Column(JSONB)
     priority = Column(Integer, default=5)  # 1-10, higher is more priority
     status = Column(String(50), default='pending')  # pending, sent, failed
     attempts = Column(Integer, default=0)
     max_attempts = Column(Integer, default=3)
     error_message = Column(Text)
-    scheduled_at = Column(DateTime, default=datetime.utcnow)
+    scheduled_at = Column(DateTime, server_default=utc_now)
     sent_at = Column(DateTime)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    
+    # Queue poll: WHERE status = 'pending' ORDER BY priority DESC, scheduled_at
+    __table_args__ = (
+        Index('email_queue_pending_idx', priority.desc(), 'scheduled_at',
+              postgresql_where=text("status = 'pending'")),
+    )
 
 class SystemSetting(Base):
     __tablename__ = 'system_settings'
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     key = Column(String(100), nullable=False, unique=True)
     value = Column(Text)
     data_type = Column(String(50), default='string')  # string, integer, boolean, json
     description = Column(Text)
     is_sensitive = Column(Boolean, default=False)  # Don't expose in API
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now)
+    updated_at = Column(DateTime, server_default=utc_now, onupdate=utc_now)
 
 class EnhancedDatabaseService:
     """Enhanced Database Service for Complete SaaS Platform"""
@@ -234,13 +272,12 @@ class EnhancedDatabaseService:
             # Create engine with optimized settings for Supabase
             self.engine = create_engine(
                 self.database_url,
-                poolclass=NullPool,  # Recommended for Supabase pooling
-                pool_pre_ping=True,
-                connect_args={
-                    "sslmode": "require",
-                    "connect_timeout": 5,  # Reduced timeout
-                    "application_name": "VeroctaAI-Backend-Enhanced"
-                },
+                **engine_options(connect_timeout=5, application_name="VeroctaAI-Backend-Enhanced",
+                                 database_url=self.database_url,
+                                 # Shares the database with the main engine's pool, so keep
+                                 # the steady-state footprint small and burst into overflow
+                                 pool_size=int(os.getenv("ENHANCED_DB_POOL_SIZE", 5)),
+                                 max_overflow=int(os.getenv("ENHANCED_DB_MAX_OVERFLOW", 10))),
                 echo=False  # Set to True for SQL debugging
             )
             
@@ -251,7 +288,9 @@ class EnhancedDatabaseService:
                 logging.info("✅ Enhanced database connection established")
             
             # Create session maker
-            self.Session = sessionmaker(bind=self.engine)
+            # Thread-local sessions, discarded at request teardown; loaded
+            # attributes stay usable after commit without a refresh SELECT
+            self.Session = scoped_session(sessionmaker(bind=self.engine, expire_on_commit=False))
             self.connected = True
             
             # Create tables in background - don't block startup
@@ -265,87 +304,163 @@ class EnhancedDatabaseService:
             self.connected = False
     
     def create_all_tables(self):
-        """Create all tables if they don't exist"""
+        """Bring the schema up to date, then seed data once per database
+
+        The schema check runs on every boot so indexes added to the models
+        reach databases seeded earlier; after the first boot the seed step
+        only pays the marker SELECT. A failed upgrade is logged and does not
+        hold up seeding.
+        """
         if not self.connected:
             return
             
         try:
-            Base.metadata.create_all(self.engine)
-            logging.info("✅ Enhanced database schema ready")
+            if ensure_schema(self.engine, Base.metadata):
+                logging.info("✅ Enhanced database tables created")
+        except Exception as e:
+            logging.error(f"Error upgrading enhanced schema: {str(e)}")
+        
+        try:
+            if self._schema_seeded():
+                logging.info("✅ Enhanced database schema ready")
+                return
             
-            # Seed data in background - don't block
-            try:
-                self._seed_initial_data()
-            except Exception as seed_error:
-                logging.warning(f"⚠️ Data seeding failed: {str(seed_error)} - continuing without seed data")
+            with self.engine.begin() as connection:
+                # Workers booting together queue here; the later ones find the
+                # marker already in place
+                connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": SCHEMA_SEED_KEY})
+                seeded = connection.execute(
+                    select(SystemSetting.value).where(SystemSetting.key == SCHEMA_SEED_KEY)
+                ).scalar()
+                if seeded is None:
+                    self._seed_initial_data(connection)
+                    connection.execute(SystemSetting.__table__.insert(), {
+                        "key": SCHEMA_SEED_KEY,
+                        "value": "1",
+                        "description": "Schema created and initial data seeded"
+                    })
+            logging.info("✅ Enhanced database schema ready")
                 
         except Exception as e:
             logging.error(f"Error creating enhanced tables: {str(e)}")
     
-    def _seed_initial_data(self):
-        """Seed initial system data"""
+    def _schema_seeded(self) -> bool:
+        """Whether the schema/seed marker row exists"""
         try:
-            session = self.Session()
-            
-            # Seed default categories
-            default_categories = [
-                {"name": "Office Supplies", "icon": "📝", "color": "#3B82F6"},
-                {"name": "Technology", "icon": "💻", "color": "#8B5CF6"},
-                {"name": "Marketing", "icon": "📢", "color": "#EF4444"},
-                {"name": "Travel", "icon": "✈️", "color": "#10B981"},
-                {"name": "Software Subscriptions", "icon": "🔄", "color": "#F59E0B"},
-                {"name": "Professional Services", "icon": "🤝", "color": "#6366F1"},
-                {"name": "Utilities", "icon": "⚡", "color": "#84CC16"},
-                {"name": "Insurance", "icon": "🛡️", "color": "#EC4899"}
-            ]
-            
-            for cat_data in default_categories:
-                existing = session.query(Category).filter_by(name=cat_data["name"]).first()
-                if not existing:
-                    category = Category(**cat_data)
-                    session.add(category)
-            
-            # Seed email templates
-            email_templates = [
-                {
-                    "name": "welcome_email",
-                    "subject": "Welcome to VeroctaAI - Your Financial Intelligence Platform",
-                    "html_content": "<h1>Welcome {{user_name}}!</h1><p>Get ready to optimize your spending with AI-powered insights.</p>",
-                    "variables": {"user_name": "string", "company": "string"}
-                },
-                {
-                    "name": "report_ready",
-                    "subject": "Your Financial Report is Ready - {{report_title}}",
-                    "html_content": "<h1>Report Complete</h1><p>Your SpendScore: {{spend_score}}/100</p>",
-                    "variables": {"report_title": "string", "spend_score": "integer"}
-                }
-            ]
-            
-            for template_data in email_templates:
-                existing = session.query(EmailTemplate).filter_by(name=template_data["name"]).first()
-                if not existing:
-                    template = EmailTemplate(**template_data)
-                    session.add(template)
-            
-            session.commit()
-            session.close()
-            logging.info("✅ Initial data seeded successfully")
-            
-        except Exception as e:
-            logging.error(f"Error seeding initial data: {str(e)}")
+            with self.engine.connect() as connection:
+                return connection.execute(
+                    select(SystemSetting.value).where(SystemSetting.key == SCHEMA_SEED_KEY)
+                ).scalar() is not None
+        except Exception:
+            # system_settings does not exist yet on a fresh database
+            return False
+    
+    def _seed_initial_data(self, connection):
+        """Seed initial system data on the caller's transaction"""
+        # Seed default categories
+        default_categories = [
+            {"name": "Office Supplies", "icon": "📝", "color": "#3B82F6"},
+            {"name": "Technology", "icon": "💻", "color": "#8B5CF6"},
+            {"name": "Marketing", "icon": "📢", "color": "#EF4444"},
+            {"name": "Travel", "icon": "✈️", "color": "#10B981"},
+            {"name": "Software Subscriptions", "icon": "🔄", "color": "#F59E0B"},
+            {"name": "Professional Services", "icon": "🤝", "color": "#6366F1"},
+            {"name": "Utilities", "icon": "⚡", "color": "#84CC16"},
+            {"name": "Insurance", "icon": "🛡️", "color": "#EC4899"}
+        ]
+        
+        # Seed email templates
+        email_templates = [
+            {
+                "name": "welcome_email",
+                "subject": "Welcome to VeroctaAI - Your Financial Intelligence Platform",
+                "html_content": "<h1>Welcome {{user_name}}!</h1><p>Get ready to optimize your spending with AI-powered insights.</p>",
+                "variables": {"user_name": "string", "company": "string"}
+            },
+            {
+                "name": "report_ready",
+                "subject": "Your Financial Report is Ready - {{report_title}}",
+                "html_content": "<h1>Report Complete</h1><p>Your SpendScore: {{spend_score}}/100</p>",
+                "variables": {"report_title": "string", "spend_score": "integer"}
+            }
+        ]
+        
+        # One idempotent INSERT ... ON CONFLICT DO NOTHING per table, no pre-SELECT;
+        # ensure_schema has already built the system-name index it relies on
+        connection.execute(
+            pg_insert(Category.__table__).on_conflict_do_nothing(
+                index_elements=["name"], index_where=text("is_system")
+            ),
+            [{**c, "is_system": True} for c in default_categories]
+        )
+        connection.execute(
+            pg_insert(EmailTemplate.__table__).on_conflict_do_nothing(index_elements=["name"]),
+            email_templates
+        )
+        logging.info("✅ Initial data seeded successfully")
     
     def get_session(self):
-        """Get database session"""
+        """Get database session
+
+        Prefer `with db.Session.begin() as session:` so commit, rollback and
+        close happen even when the block raises.
+        """
         if not self.connected or not self.Session:
             return None
         return self.Session()
+    
+    def get_reports_with_insights(self, user_id: str, limit: int = 50) -> List[Report]:
+        """Load a user's reports with their insights and owner in two queries
+
+        Returned objects are detached but fully loaded, so serializing them
+        issues no further SELECTs.
+        """
+        if not self.connected:
+            return []
+        
+        with self.Session() as session:
+            return session.scalars(
+                select(Report)
+                .where(Report.user_id == user_id)
+                .order_by(Report.created_at.desc())
+                .limit(limit)
+                .options(selectinload(Report.detailed_insights), joinedload(Report.user))
+            ).all()
+    
+    def bulk_insert(self, table, rows: Iterable[Dict], chunk_size: int = 1000) -> int:
+        """Insert rows in chunks of chunk_size within a single transaction
+
+        rows may be any iterable (e.g. a generator over an upload), so only one
+        chunk is held in memory at a time. Returns the number of rows inserted.
+        """
+        if not self.connected:
+            return 0
+        
+        table = getattr(table, '__table__', table)
+        inserted = 0
+        rows = iter(rows)
+        with self.engine.begin() as connection:
+            while batch := list(itertools.islice(rows, chunk_size)):
+                connection.execute(table.insert(), batch)
+                inserted += len(batch)
+        return inserted
 
 # Initialize enhanced database service lazily
 enhanced_db = None
+_enhanced_db_lock = threading.Lock()
+
+def remove_session(exception=None):
+    """Discard the current thread's enhanced session at the end of a request"""
+    if enhanced_db is not None and enhanced_db.Session is not None:
+        enhanced_db.Session.remove()
 
 def get_enhanced_db():
     """Get or initialize enhanced database service"""
     global enhanced_db
     if enhanced_db is None:
-        enhanced_db = EnhancedDatabaseService()
+        # One service (and so one connection pool) per process, even when the
+        # first requests arrive concurrently
+        with _enhanced_db_lock:
+            if enhanced_db is None:
+                enhanced_db = EnhancedDatabaseService()
     return enhanced_db
\ No newline at end of file
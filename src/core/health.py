@@ -4,92 +4,117 @@ Provides system health monitoring for Render deployment
 """
 
 import os
+import time
 import logging
 from datetime import datetime
+from functools import lru_cache
+
+# Seconds the environment/integration checks are reused between probes
+HEALTH_CACHE_SECONDS = int(os.environ.get('HEALTH_CACHE_SECONDS', 30))
+
+_SENSITIVE_ENV_MARKERS = ("key", "secret", "password")
+
+ENVIRONMENT = os.environ.get('FLASK_ENV', 'development')
+REQUIRED_ENV_VARS = ('SESSION_SECRET',)
+OPTIONAL_ENV_VARS = ('OPENAI_API_KEY', 'SUPABASE_URL', 'SUPABASE_PASSWORD', 'SUPABASE_ANON_KEY')
 
 def check_health():
     """
     Comprehensive health check for the VeroctaAI system
     Returns status information for monitoring
     """
-    health_status = {
-        "status": "healthy",
+    status, checks = _configuration_checks(int(time.monotonic() // HEALTH_CACHE_SECONDS))
+    return {
+        "status": status,
         "timestamp": datetime.utcnow().isoformat(),
         "version": "1.0.0",
-        "environment": os.environ.get('FLASK_ENV', 'development'),
-        "checks": {}
+        "environment": ENVIRONMENT,
+        "checks": checks
     }
+
+@lru_cache(maxsize=1)
+def _configuration_checks(time_bucket: int):
+    """Environment, database and AI checks, rebuilt once per time bucket
+
+    Render probes the health endpoint often; the bucket argument makes the
+    single cached entry expire every HEALTH_CACHE_SECONDS.
+    """
+    status = "healthy"
+    checks = {}
     
     # Check environment variables
-    required_env_vars = ['SESSION_SECRET']
-    optional_env_vars = ['OPENAI_API_KEY', 'SUPABASE_URL', 'SUPABASE_PASSWORD', 'SUPABASE_ANON_KEY']
-    
     env_check = {"status": "pass", "details": {}}
     
     # Check required variables
-    for var in required_env_vars:
+    for var in REQUIRED_ENV_VARS:
         if os.environ.get(var):
             env_check["details"][var] = "✅ Set"
         else:
             env_check["details"][var] = "❌ Missing"
             env_check["status"] = "fail"
-            health_status["status"] = "unhealthy"
+            status = "unhealthy"
     
     # Check optional variables
-    for var in optional_env_vars:
+    for var in OPTIONAL_ENV_VARS:
         if os.environ.get(var):
             env_check["details"][var] = "✅ Set"
         else:
             env_check["details"][var] = "⚠️ Not set (optional)"
     
-    health_status["checks"]["environment"] = env_check
+    checks["environment"] = env_check
     
     # Check database connection (non-blocking)
-    db_check = {"status": "pass", "details": "Database not configured"}
     if os.environ.get('SUPABASE_URL') and os.environ.get('SUPABASE_PASSWORD'):
         db_check = {"status": "pass", "details": "✅ Database URL configured (connection not tested in health check)"}
     else:
         db_check = {"status": "pass", "details": "⚠️ Database not configured (using in-memory storage)"}
     
-    health_status["checks"]["database"] = db_check
+    checks["database"] = db_check
     
     # Check AI integration
-    ai_check = {"status": "pass", "details": "AI not configured"}
     if os.environ.get('OPENAI_API_KEY'):
         try:
             import openai
             ai_check = {"status": "pass", "details": "✅ OpenAI API configured"}
         except Exception as e:
             ai_check = {"status": "fail", "details": f"❌ OpenAI error: {str(e)}"}
-            health_status["status"] = "unhealthy"
+            status = "unhealthy"
     else:
         ai_check = {"status": "pass", "details": "⚠️ OpenAI API not configured (optional)"}
     
-    health_status["checks"]["ai"] = ai_check
+    checks["ai"] = ai_check
     
     # Frontend removed in backend-only repository
-    health_status["checks"]["frontend"] = {
+    checks["frontend"] = {
         "status": "removed",
         "details": "Frontend files have been removed; this is a backend-only repository"
     }
     
-    return health_status
+    return status, checks
 
 def get_system_info():
     """
     Get system information for debugging
     """
+    return _system_info()
+
+@lru_cache(maxsize=1)
+def _system_info():
+    """Platform details and masked environment, gathered once per process"""
     import platform
     import sys
     
+    environment_variables = {}
+    for key, value in os.environ.items():
+        folded = key.casefold()
+        masked = any(marker in folded for marker in _SENSITIVE_ENV_MARKERS)
+        environment_variables[key] = "***" if masked else value
+    
     return {
         "python_version": sys.version,
         "platform": platform.platform(),
         "architecture": platform.architecture(),
         "processor": platform.processor(),
         "working_directory": os.getcwd(),
-        "environment_variables": {
-            key: "***" if "key" in key.lower() or "secret" in key.lower() or "password" in key.lower() 
-            else value for key, value in os.environ.items()
-        }
+        "environment_variables": environment_variables
     }
@@ -8,6 +8,7 @@ from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identi
 from werkzeug.utils import secure_filename
 from .app import app
 from .auth import validate_user, create_user, get_current_user, require_admin
+from .bcrypt_pool import QueueFullError
 from .models import create_report, get_reports_by_user, get_report_by_id, delete_report, init_sample_data
 try:
     from .database import db_service
@@ -107,6 +108,13 @@ def serve_logo_png():
     return send_from_directory('dynamic/assets/images', 'verocta-logo.png')
 
 # Authentication Routes
+def _auth_busy():
+    """503 response for when the password hashing pool is saturated"""
+    response = jsonify({'success': False, 'error': 'Authentication service is busy, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     """User login endpoint"""
@@ -148,6 +156,8 @@ def login():
                 'company': user['company']
             }
         })
+    except QueueFullError:
+        return _auth_busy()
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -198,6 +208,8 @@ def register():
                 'last_name': data.get('last_name', '')
             }
         }), 201
+    except QueueFullError:
+        return _auth_busy()
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -0,0 +1,57 @@
+"""
+Batched user lookups for VeroctaAI
+Coalesces concurrent lookups from request threads into a single query
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+# Seconds a request thread waits for its batch to resolve
+USER_LOADER_TIMEOUT = float(os.environ.get('USER_LOADER_TIMEOUT', 5))
+
+class UserLoader:
+    """DataLoader-style coalescer for user lookups keyed by email"""
+    
+    def __init__(self, batch_fn: Callable[[List[str]], Dict[str, Dict]], delay: float = 0.005):
+        self._batch_fn = batch_fn
+        self._delay = delay
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._timer = None
+    
+    def load(self, email: str) -> Future:
+        """Queue a lookup and return a Future resolving to the user dict or None"""
+        with self._lock:
+            future = self._pending.get(email)
+            if future is None:
+                future = Future()
+                self._pending[email] = future
+                if self._timer is None:
+                    # First lookup of a window schedules the batch
+                    self._timer = threading.Timer(self._delay, self._dispatch)
+                    self._timer.daemon = True
+                    self._timer.start()
+        return future
+    
+    def _dispatch(self):
+        """Resolve every pending lookup with one batched query"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._timer = None
+        
+        if not batch:
+            return
+        
+        try:
+            users = self._batch_fn(list(batch))
+        except Exception as e:
+            logging.error(f"Batched user lookup error: {str(e)}")
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        
+        for email, future in batch.items():
+            future.set_result(users.get(email))
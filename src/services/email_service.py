@@ -4,31 +4,215 @@ Handles email notifications, reports, and communications
 """
 
 import os
+import asyncio
 import logging
+import threading
 from typing import Dict, List, Optional, Any
-from datetime import datetime
-import requests
+from datetime import datetime, timedelta
+from functools import lru_cache
+import httpx
 import json
+from jinja2 import DictLoader, Environment
+
+# Provider settings, read once at import
+RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
+POSTMARK_API_KEY = os.environ.get('POSTMARK_API_KEY')
+FROM_EMAIL = os.environ.get('FROM_EMAIL', 'noreply@verocta.ai')
+FROM_NAME = os.environ.get('FROM_NAME', 'VeroctaAI')
+
+# Provider API timeouts and connect retries
+EMAIL_HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+EMAIL_HTTP_RETRIES = 3
+
+# Outbound mail goes through the email_queue table and a background sender
+# thread, so request threads never wait on the provider
+EMAIL_QUEUE_ENABLED = os.environ.get('EMAIL_QUEUE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+EMAIL_QUEUE_BATCH_SIZE = int(os.environ.get('EMAIL_QUEUE_BATCH_SIZE', 50))
+EMAIL_QUEUE_POLL_INTERVAL = float(os.environ.get('EMAIL_QUEUE_POLL_INTERVAL', 5))
+# Seconds a claimed row stays hidden from other workers; if the sender dies
+# mid-batch the row becomes due again once this lapses
+EMAIL_QUEUE_LEASE = int(os.environ.get('EMAIL_QUEUE_LEASE', 300))
+
+# Email bodies, compiled once; autoescape keeps user-supplied names and
+# titles from injecting markup
+_WELCOME_HTML = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Welcome to VeroctaAI</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #4F46E5;">Welcome to VeroctaAI!</h1>
+                <p>Hi {{ user_name }},</p>
+                <p>Welcome to VeroctaAI - your AI-powered financial intelligence platform!</p>
+                <p>We're excited to help you optimize your financial operations and gain valuable insights from your spending data.</p>
+                
+                <h2 style="color: #4F46E5;">Getting Started:</h2>
+                <ul>
+                    <li>Upload your CSV files from QuickBooks, Wave, Revolut, or Xero</li>
+                    <li>Get instant SpendScore analysis</li>
+                    <li>Receive AI-powered insights and recommendations</li>
+                    <li>Generate professional financial reports</li>
+                </ul>
+                
+                <p>If you have any questions, feel free to reach out to our support team.</p>
+                <p>Best regards,<br>The VeroctaAI Team</p>
+            </div>
+        </body>
+        </html>
+        """
+
+_REPORT_HTML = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Your VeroctaAI Report</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #4F46E5;">Your Financial Report is Ready!</h1>
+                <p>Hi {{ user_name }},</p>
+                <p>Your financial analysis report "{{ title }}" has been completed.</p>
+                
+                <div style="background: #F3F4F6; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3 style="color: #4F46E5; margin-top: 0;">SpendScore: {{ spend_score }}/100</h3>
+                    <p>Your financial efficiency score based on our AI analysis.</p>
+                </div>
+                
+                <p>Key insights from your analysis:</p>
+                <ul>
+                    <li>Identified {{ duplicate_expenses }} duplicate expenses</li>
+                    <li>Found {{ spending_spikes }} spending spikes</li>
+                    <li>Discovered {{ savings_opportunities }} savings opportunities</li>
+                </ul>
+                
+                <p>Your detailed report is attached to this email.</p>
+                <p>Best regards,<br>The VeroctaAI Team</p>
+            </div>
+        </body>
+        </html>
+        """
+
+_SUBSCRIPTION_HTML = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Subscription Confirmed</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #4F46E5;">Subscription Confirmed!</h1>
+                <p>Hi {{ user_name }},</p>
+                <p>Thank you for subscribing to VeroctaAI Professional!</p>
+                <p>Your subscription is now active and you have access to all premium features.</p>
+                <p>Best regards,<br>The VeroctaAI Team</p>
+            </div>
+        </body>
+        </html>
+        """
+
+_PAYMENT_FAILED_HTML = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Payment Failed</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #DC2626;">Payment Failed</h1>
+                <p>Hi {{ user_name }},</p>
+                <p>We were unable to process your payment. Please update your payment method to continue using VeroctaAI.</p>
+                <p>Best regards,<br>The VeroctaAI Team</p>
+            </div>
+        </body>
+        </html>
+        """
+
+_DIGEST_HTML = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Weekly Financial Digest</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #4F46E5;">Your Weekly Financial Digest</h1>
+                <p>Hi {{ user_name }},</p>
+                <p>Here's your weekly financial summary from VeroctaAI.</p>
+                {% if reports_7d %}
+                <ul>
+                    <li>Reports this week: {{ reports_7d }}</li>
+                    {% if score_7d is not none %}<li>Average SpendScore: {{ score_7d | round | int }}/100</li>{% endif %}
+                    {% if total_7d is not none %}<li>Total analyzed spend: ${{ "{:,.2f}".format(total_7d) }}</li>{% endif %}
+                </ul>
+                {% endif %}
+                <p>Best regards,<br>The VeroctaAI Team</p>
+            </div>
+        </body>
+        </html>
+        """
+
+_TEMPLATE_ENV = Environment(
+    loader=DictLoader({
+        'welcome': _WELCOME_HTML,
+        'report': _REPORT_HTML,
+        'subscription': _SUBSCRIPTION_HTML,
+        'payment_failed': _PAYMENT_FAILED_HTML,
+        'digest': _DIGEST_HTML
+    }),
+    autoescape=True
+)
+_TEMPLATES = {name: _TEMPLATE_ENV.get_template(name) for name in _TEMPLATE_ENV.list_templates()}
 
 class EmailService:
     """Email service for handling notifications and communications"""
     
     def __init__(self):
-        self.resend_api_key = os.environ.get('RESEND_API_KEY')
-        self.postmark_api_key = os.environ.get('POSTMARK_API_KEY')
-        self.from_email = os.environ.get('FROM_EMAIL', 'noreply@verocta.ai')
-        self.from_name = os.environ.get('FROM_NAME', 'VeroctaAI')
+        self.resend_api_key = RESEND_API_KEY
+        self.postmark_api_key = POSTMARK_API_KEY
+        self.from_email = FROM_EMAIL
+        self.from_name = FROM_NAME
         
-        # Determine which service to use
+        # Determine which service to use,
+        # and resolve its sender and request builder once
         if self.resend_api_key:
             self.service = 'resend'
             self.api_key = self.resend_api_key
+            self._send_impl = self._send_via_resend
+            self._build_request = self._resend_request
         elif self.postmark_api_key:
             self.service = 'postmark'
             self.api_key = self.postmark_api_key
+            self._send_impl = self._send_via_postmark
+            self._build_request = self._postmark_request
         else:
             self.service = None
+            self._send_impl = self._send_demo
+            self._build_request = None
             logging.warning("No email service configured - using demo mode")
+        
+        # One HTTP/2 client so concurrent sends multiplex over the provider's
+        # TLS connection. Transport retries cover failed connects only, so no
+        # email is sent twice.
+        self.http = httpx.Client(
+            timeout=EMAIL_HTTP_TIMEOUT,
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=EMAIL_HTTP_RETRIES,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+            )
+        )
+        
+        self._queue_wakeup = threading.Event()
+        self._queue_worker_pid = None
+        self._queue_worker_lock = threading.Lock()
+        self._worker_state = threading.local()
     
     def send_welcome_email(self, user_email: str, user_name: str, company: str = None) -> bool:
         """Send welcome email to new user"""
@@ -79,8 +263,15 @@ class EmailService:
             template_type='payment_failed'
         )
     
-    def send_weekly_digest(self, user_email: str, user_name: str, digest_data: Dict) -> bool:
-        """Send weekly financial digest"""
+    def send_weekly_digest(self, user_email: str, user_name: str, digest_data: Dict = None,
+                           user_id: str = None) -> bool:
+        """Send weekly financial digest
+
+        Without digest_data, the figures come from the user_weekly_summary view.
+        """
+        if digest_data is None and user_id:
+            from ..core.database import db_service
+            digest_data = db_service.get_weekly_summary(user_id)
         subject = "Your Weekly Financial Digest - VeroctaAI"
         html_content = self._get_digest_email_template(user_name, digest_data)
         
@@ -93,25 +284,192 @@ class EmailService:
     
     def _send_email(self, to: str, subject: str, html_content: str, 
                    template_type: str = 'general', attachments: List = None) -> bool:
-        """Send email using configured service"""
-        if not self.service:
-            logging.info(f"Demo: Email sent to {to} - {subject}")
+        """Send email using configured service, queued when the database is available"""
+        # The queue has no attachment column, so those are sent inline
+        if self.service and not attachments and self.enqueue(to, subject, html_content, template_type):
             return True
         
         try:
-            if self.service == 'resend':
-                return self._send_via_resend(to, subject, html_content, attachments)
-            elif self.service == 'postmark':
-                return self._send_via_postmark(to, subject, html_content, attachments)
-            else:
-                logging.error("Unknown email service")
-                return False
+            return self._send_impl(to, subject, html_content, attachments)
         except Exception as e:
             logging.error(f"Error sending email: {str(e)}")
             return False
     
+    def _send_demo(self, to: str, subject: str, html_content: str, attachments: List = None) -> bool:
+        """Log instead of sending when no provider is configured"""
+        logging.info(f"Demo: Email sent to {to} - {subject}")
+        return True
+    
+    def _queue_db(self):
+        """Enhanced database service when the email_queue table can be used"""
+        if not EMAIL_QUEUE_ENABLED:
+            return None
+        try:
+            from ..core.database_enhanced import get_enhanced_db
+            db = get_enhanced_db()
+        except Exception as e:
+            logging.warning(f"Email queue unavailable: {str(e)}")
+            return None
+        return db if db.connected else None
+    
+    def enqueue(self, to: str, subject: str, html_content: str,
+                template_type: str = 'general', priority: int = 5) -> bool:
+        """Queue an email for the background sender; False if the queue is unavailable"""
+        db = self._queue_db()
+        if db is None:
+            return False
+        
+        from ..core.database_enhanced import EmailQueue
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(EmailQueue.__table__.insert(), {
+                    'to_email': to,
+                    'from_email': self.from_email,
+                    'subject': subject,
+                    'html_content': html_content,
+                    'template_name': template_type,
+                    'priority': priority,
+                    'scheduled_at': datetime.utcnow()
+                })
+        except Exception as e:
+            logging.error(f"Error queueing email: {str(e)}")
+            return False
+        
+        self._start_queue_worker()
+        self._queue_wakeup.set()
+        return True
+    
+    def drain(self, batch: int = EMAIL_QUEUE_BATCH_SIZE) -> int:
+        """Send up to batch due emails from the queue; returns how many were sent"""
+        db = self._queue_db()
+        if db is None:
+            return 0
+        
+        from sqlalchemy import case, select, update
+        from ..core.database_enhanced import EmailQueue
+        now = datetime.utcnow()
+        
+        # Claim due rows in one statement: SKIP LOCKED lets several workers poll
+        # at once, and pushing scheduled_at out by the lease hides the rows
+        # from the next poll without holding a transaction open while sending
+        due = (
+            select(EmailQueue.id)
+            .where(EmailQueue.status == 'pending', EmailQueue.scheduled_at <= now)
+            .order_by(EmailQueue.priority.desc(), EmailQueue.scheduled_at)
+            .limit(batch)
+            .with_for_update(skip_locked=True)
+        )
+        with db.engine.begin() as connection:
+            claimed = connection.execute(
+                update(EmailQueue)
+                .where(EmailQueue.id.in_(due.scalar_subquery()))
+                .values(
+                    attempts=EmailQueue.attempts + 1,
+                    scheduled_at=now + timedelta(seconds=EMAIL_QUEUE_LEASE)
+                )
+                .returning(EmailQueue.id, EmailQueue.to_email, EmailQueue.subject, EmailQueue.html_content)
+            ).all()
+        if not claimed:
+            return 0
+        
+        sent_ids, failed = [], {}
+        for email_id, error in self._send_batch(claimed):
+            if error is None:
+                sent_ids.append(email_id)
+            else:
+                failed[email_id] = error
+        
+        with db.engine.begin() as connection:
+            if sent_ids:
+                connection.execute(
+                    update(EmailQueue)
+                    .where(EmailQueue.id.in_(sent_ids))
+                    .values(status='sent', sent_at=datetime.utcnow(), error_message=None)
+                )
+            for email_id, error in failed.items():
+                # Still pending rows retry once their lease lapses
+                connection.execute(
+                    update(EmailQueue)
+                    .where(EmailQueue.id == email_id)
+                    .values(
+                        status=case((EmailQueue.attempts >= EmailQueue.max_attempts, 'failed'), else_='pending'),
+                        error_message=error
+                    )
+                )
+        if failed:
+            logging.warning(f"Email queue: {len(failed)} of {len(claimed)} sends failed")
+        return len(sent_ids)
+    
+    def _send_batch(self, rows) -> List:
+        """Send claimed rows concurrently; returns (id, error or None) per row
+
+        The worker thread keeps one event loop and AsyncClient so connections
+        stay alive between batches; other callers get a one-off client.
+        """
+        loop = getattr(self._worker_state, 'loop', None)
+        if loop is not None:
+            return loop.run_until_complete(self._send_rows(self._worker_state.client, rows))
+        
+        async def send_with_new_client():
+            async with self._new_async_client() as client:
+                return await self._send_rows(client, rows)
+        return asyncio.run(send_with_new_client())
+    
+    def _new_async_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=EMAIL_HTTP_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=EMAIL_HTTP_RETRIES,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+            )
+        )
+    
+    async def _send_rows(self, client: httpx.AsyncClient, rows) -> List:
+        async def send_one(row):
+            url, headers, data = self._build_request(row.to_email, row.subject, row.html_content)
+            try:
+                response = await client.post(url, headers=headers, json=data)
+            except httpx.HTTPError as e:
+                return row.id, str(e)
+            if response.status_code != 200:
+                return row.id, f"Provider returned {response.status_code}"
+            return row.id, None
+        
+        # Wall time is the slowest send rather than the sum; the client's
+        # connection limit caps how many run against the provider at once
+        return await asyncio.gather(*(send_one(row) for row in rows))
+    
+    def _start_queue_worker(self):
+        """Start the sender thread once per process (threads do not survive fork)"""
+        if self._queue_worker_pid == os.getpid():
+            return
+        with self._queue_worker_lock:
+            if self._queue_worker_pid != os.getpid():
+                self._queue_worker_pid = os.getpid()
+                threading.Thread(target=self._run_queue_worker, daemon=True).start()
+    
+    def _run_queue_worker(self):
+        self._worker_state.loop = asyncio.new_event_loop()
+        self._worker_state.client = self._new_async_client()
+        while True:
+            try:
+                sent = self.drain()
+            except Exception as e:
+                logging.error(f"Email queue worker error: {str(e)}")
+                sent = 0
+            if not sent:
+                self._queue_wakeup.wait(EMAIL_QUEUE_POLL_INTERVAL)
+                self._queue_wakeup.clear()
+    
     def _send_via_resend(self, to: str, subject: str, html_content: str, attachments: List = None) -> bool:
         """Send email via Resend API"""
+        url, headers, data = self._resend_request(to, subject, html_content, attachments)
+        response = self.http.post(url, headers=headers, json=data)
+        return response.status_code == 200
+    
+    def _resend_request(self, to: str, subject: str, html_content: str, attachments: List = None):
+        """URL, headers and JSON body for a Resend send"""
         url = "https://api.resend.com/emails"
         headers = {
             "Authorization": f"Bearer {self.resend_api_key}",
@@ -128,11 +486,16 @@ class EmailService:
         if attachments:
             data["attachments"] = attachments
         
-        response = requests.post(url, headers=headers, json=data)
-        return response.status_code == 200
+        return url, headers, data
     
     def _send_via_postmark(self, to: str, subject: str, html_content: str, attachments: List = None) -> bool:
         """Send email via Postmark API"""
+        url, headers, data = self._postmark_request(to, subject, html_content, attachments)
+        response = self.http.post(url, headers=headers, json=data)
+        return response.status_code == 200
+    
+    def _postmark_request(self, to: str, subject: str, html_content: str, attachments: List = None):
+        """URL, headers and JSON body for a Postmark send"""
         url = "https://api.postmarkapp.com/email"
         headers = {
             "X-Postmark-Server-Token": self.postmark_api_key,
@@ -149,137 +512,36 @@ class EmailService:
         if attachments:
             data["Attachments"] = attachments
         
-        response = requests.post(url, headers=headers, json=data)
-        return response.status_code == 200
+        return url, headers, data
     
     def _get_welcome_email_template(self, user_name: str, company: str = None) -> str:
         """Generate welcome email HTML template"""
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Welcome to VeroctaAI</title>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h1 style="color: #4F46E5;">Welcome to VeroctaAI!</h1>
-                <p>Hi {user_name},</p>
-                <p>Welcome to VeroctaAI - your AI-powered financial intelligence platform!</p>
-                <p>We're excited to help you optimize your financial operations and gain valuable insights from your spending data.</p>
-                
-                <h2 style="color: #4F46E5;">Getting Started:</h2>
-                <ul>
-                    <li>Upload your CSV files from QuickBooks, Wave, Revolut, or Xero</li>
-                    <li>Get instant SpendScore analysis</li>
-                    <li>Receive AI-powered insights and recommendations</li>
-                    <li>Generate professional financial reports</li>
-                </ul>
-                
-                <p>If you have any questions, feel free to reach out to our support team.</p>
-                <p>Best regards,<br>The VeroctaAI Team</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _TEMPLATES['welcome'].render(user_name=user_name, company=company)
     
     def _get_report_email_template(self, user_name: str, report_data: Dict) -> str:
         """Generate report email HTML template"""
-        spend_score = report_data.get('spend_score', 0)
-        title = report_data.get('title', 'Financial Analysis')
-        
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Your VeroctaAI Report</title>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h1 style="color: #4F46E5;">Your Financial Report is Ready!</h1>
-                <p>Hi {user_name},</p>
-                <p>Your financial analysis report "{title}" has been completed.</p>
-                
-                <div style="background: #F3F4F6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="color: #4F46E5; margin-top: 0;">SpendScore: {spend_score}/100</h3>
-                    <p>Your financial efficiency score based on our AI analysis.</p>
-                </div>
-                
-                <p>Key insights from your analysis:</p>
-                <ul>
-                    <li>Identified {report_data.get('duplicate_expenses', 0)} duplicate expenses</li>
-                    <li>Found {report_data.get('spending_spikes', 0)} spending spikes</li>
-                    <li>Discovered {report_data.get('savings_opportunities', 0)} savings opportunities</li>
-                </ul>
-                
-                <p>Your detailed report is attached to this email.</p>
-                <p>Best regards,<br>The VeroctaAI Team</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _TEMPLATES['report'].render(
+            user_name=user_name,
+            title=report_data.get('title', 'Financial Analysis'),
+            spend_score=report_data.get('spend_score', 0),
+            duplicate_expenses=report_data.get('duplicate_expenses', 0),
+            spending_spikes=report_data.get('spending_spikes', 0),
+            savings_opportunities=report_data.get('savings_opportunities', 0)
+        )
     
     def _get_subscription_email_template(self, user_name: str, subscription_data: Dict) -> str:
         """Generate subscription confirmation email template"""
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Subscription Confirmed</title>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h1 style="color: #4F46E5;">Subscription Confirmed!</h1>
-                <p>Hi {user_name},</p>
-                <p>Thank you for subscribing to VeroctaAI Professional!</p>
-                <p>Your subscription is now active and you have access to all premium features.</p>
-                <p>Best regards,<br>The VeroctaAI Team</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _TEMPLATES['subscription'].render(user_name=user_name)
     
     def _get_payment_failed_template(self, user_name: str, payment_data: Dict) -> str:
         """Generate payment failed email template"""
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Payment Failed</title>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h1 style="color: #DC2626;">Payment Failed</h1>
-                <p>Hi {user_name},</p>
-                <p>We were unable to process your payment. Please update your payment method to continue using VeroctaAI.</p>
-                <p>Best regards,<br>The VeroctaAI Team</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _TEMPLATES['payment_failed'].render(user_name=user_name)
     
     def _get_digest_email_template(self, user_name: str, digest_data: Dict) -> str:
         """Generate weekly digest email template"""
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Weekly Financial Digest</title>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h1 style="color: #4F46E5;">Your Weekly Financial Digest</h1>
-                <p>Hi {user_name},</p>
-                <p>Here's your weekly financial summary from VeroctaAI.</p>
-                <p>Best regards,<br>The VeroctaAI Team</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _TEMPLATES['digest'].render({**(digest_data or {}), 'user_name': user_name})
 
-# Global email service instance
-email_service = EmailService()
+@lru_cache(maxsize=1)
+def get_email_service() -> EmailService:
+    """Get the process-wide email service, created on first use"""
+    return EmailService()
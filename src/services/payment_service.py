@@ -4,14 +4,78 @@ Handles Stripe subscriptions, billing, and payment processing
 """
 
 import os
+import time
+import atexit
+import asyncio
+import functools
+import queue
 import logging
+import threading
 from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import requests
 import stripe
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Initialize Stripe
 stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
 
+# Pooled keep-alive session behind every stripe SDK call, so requests reuse
+# TLS connections to api.stripe.com instead of handshaking per call. Retry only covers idempotent methods by default, so POSTs
+# are never replayed here; the SDK's own idempotency keys handle those.
+STRIPE_HTTP_TIMEOUT = int(os.environ.get('STRIPE_HTTP_TIMEOUT', 5))
+_stripe_session = requests.Session()
+_stripe_session.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# Verified webhook events are acknowledged immediately and handled by a
+# background thread in batches of up to WEBHOOK_BATCH_SIZE, or whatever
+# arrived within WEBHOOK_MAX_WAIT seconds of the first event
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 64))
+WEBHOOK_MAX_WAIT = float(os.environ.get('WEBHOOK_MAX_WAIT', 0.1))
+# Seconds an exiting worker spends handling events still queued
+WEBHOOK_DRAIN_TIMEOUT = float(os.environ.get('WEBHOOK_DRAIN_TIMEOUT', 10))
+_WEBHOOK_STOP = object()
+
+# Stripe delivers webhooks at least once; event ids seen within this window
+# are acknowledged without running the handlers again
+WEBHOOK_DEDUPE_TTL = 86400
+_seen_events = TTLCache(maxsize=100000, ttl=WEBHOOK_DEDUPE_TTL)
+_seen_events_lock = threading.Lock()
+
+def _mark_event_seen(event_id: str) -> bool:
+    """Record a webhook event id; False if it was already recorded"""
+    from ..core.auth import get_redis_client
+    store = get_redis_client()
+    if store is not None:
+        try:
+            return bool(store.set(f"stripe:event:{event_id}", 1, nx=True, ex=WEBHOOK_DEDUPE_TTL))
+        except Exception:
+            pass
+    with _seen_events_lock:
+        if event_id in _seen_events:
+            return False
+        _seen_events[event_id] = True
+        return True
+
+def _forget_event(event_id: str):
+    """Drop a webhook event id's seen mark so a redelivery or resend is handled"""
+    from ..core.auth import get_redis_client
+    store = get_redis_client()
+    if store is not None:
+        try:
+            store.delete(f"stripe:event:{event_id}")
+        except Exception:
+            pass
+    with _seen_events_lock:
+        _seen_events.pop(event_id, None)
+
 class PaymentService:
     """Payment service for handling Stripe subscriptions and billing"""
     
@@ -19,6 +83,33 @@ class PaymentService:
         self.stripe_enabled = bool(stripe.api_key)
         if not self.stripe_enabled:
             logging.warning("Stripe not configured - using demo mode")
+        self._webhook_secret = os.environ.get('STRIPE_WEBHOOK_SECRET')
+        if self.stripe_enabled and not self._webhook_secret:
+            logging.error("Stripe webhook secret not configured - webhooks will be rejected")
+        self.http_client = stripe.http_client.RequestsClient(timeout=STRIPE_HTTP_TIMEOUT, session=_stripe_session)
+        stripe.default_http_client = self.http_client
+        self._webhook_queue = queue.Queue()
+        self._webhook_worker_pid = None
+        self._webhook_thread = None
+        self._webhook_worker_lock = threading.Lock()
+        # Event type -> handler taking the list of objects from one batch and
+        # returning the ones it failed on (None if all succeeded). Per-event
+        # handlers are wrapped once here; a bulk handler can replace its entry
+        # without touching the dispatch path.
+        self._webhook_handlers = {
+            event_type: self._per_event(event_type, handler)
+            for event_type, handler in (
+                ('customer.subscription.created', self._handle_subscription_created),
+                ('customer.subscription.updated', self._handle_subscription_updated),
+                ('customer.subscription.deleted', self._handle_subscription_deleted),
+                ('invoice.payment_succeeded', self._handle_payment_succeeded),
+                ('invoice.payment_failed', self._handle_payment_failed),
+            )
+        }
+    
+    def close(self):
+        """Close pooled Stripe connections on shutdown"""
+        _stripe_session.close()
     
     def create_customer(self, email: str, name: str = None, company: str = None) -> Optional[Dict]:
         """Create Stripe customer"""
@@ -103,6 +194,34 @@ class PaymentService:
             logging.error(f"Error creating payment intent: {str(e)}")
             return None
     
+    def create_checkout_session(self, customer_id: str, price_id: str, success_url: str,
+                                cancel_url: str, metadata: Dict = None) -> Optional[Dict]:
+        """Create a subscription Checkout session"""
+        try:
+            return stripe.checkout.Session.create(
+                customer=customer_id,
+                payment_method_types=['card'],
+                line_items=[{'price': price_id, 'quantity': 1}],
+                mode='subscription',
+                success_url=success_url,
+                cancel_url=cancel_url,
+                metadata=metadata or {}
+            )
+        except Exception as e:
+            logging.error(f"Stripe checkout error: {str(e)}")
+            return None
+    
+    def create_billing_portal_session(self, customer_id: str, return_url: str) -> Optional[Dict]:
+        """Create a Customer Portal session"""
+        try:
+            return stripe.billing_portal.Session.create(
+                customer=customer_id,
+                return_url=return_url
+            )
+        except Exception as e:
+            logging.error(f"Stripe portal error: {str(e)}")
+            return None
+    
     def handle_webhook(self, payload: str, sig_header: str) -> bool:
         """Handle Stripe webhook events"""
         if not self.stripe_enabled:
@@ -110,32 +229,120 @@ class PaymentService:
             return True
         
         try:
-            webhook_secret = os.environ.get('STRIPE_WEBHOOK_SECRET')
-            if not webhook_secret:
-                logging.error("Stripe webhook secret not configured")
+            if not self._webhook_secret:
                 return False
             
             event = stripe.Webhook.construct_event(
-                payload, sig_header, webhook_secret
+                payload, sig_header, self._webhook_secret
             )
             
-            # Handle different event types
-            if event['type'] == 'customer.subscription.created':
-                self._handle_subscription_created(event['data']['object'])
-            elif event['type'] == 'customer.subscription.updated':
-                self._handle_subscription_updated(event['data']['object'])
-            elif event['type'] == 'customer.subscription.deleted':
-                self._handle_subscription_deleted(event['data']['object'])
-            elif event['type'] == 'invoice.payment_succeeded':
-                self._handle_payment_succeeded(event['data']['object'])
-            elif event['type'] == 'invoice.payment_failed':
-                self._handle_payment_failed(event['data']['object'])
+            if event['type'] in self._webhook_handlers:
+                if not _mark_event_seen(event['id']):
+                    logging.info(f"Duplicate webhook event skipped: {event['id']}")
+                    return True
+                self._start_webhook_worker()
+                self._webhook_queue.put(event)
             
             return True
         except Exception as e:
             logging.error(f"Error handling webhook: {str(e)}")
             return False
     
+    def _start_webhook_worker(self):
+        """Start the webhook thread once per process (threads do not survive fork)"""
+        if self._webhook_worker_pid == os.getpid():
+            return
+        with self._webhook_worker_lock:
+            if self._webhook_worker_pid != os.getpid():
+                self._webhook_worker_pid = os.getpid()
+                self._webhook_thread = threading.Thread(target=self._run_webhook_worker, daemon=True)
+                self._webhook_thread.start()
+    
+    def _run_webhook_worker(self):
+        while True:
+            event = self._webhook_queue.get()
+            if event is _WEBHOOK_STOP:
+                return
+            batch = [event]
+            stopping = False
+            deadline = time.monotonic() + WEBHOOK_MAX_WAIT
+            while len(batch) < WEBHOOK_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self._webhook_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _WEBHOOK_STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            self._dispatch_webhook_batch(batch)
+            if stopping:
+                return
+    
+    def drain_webhooks(self, timeout: float = None):
+        """Handle queued webhook events before the process exits
+
+        They have already been acknowledged, so Stripe will not redeliver
+        them. Runs from gunicorn's worker_exit hook and atexit; events still
+        queued after the timeout lose their seen mark so a dashboard resend
+        is handled.
+        """
+        thread = self._webhook_thread
+        if self._webhook_worker_pid != os.getpid() or thread is None or not thread.is_alive():
+            return
+        self._webhook_queue.put(_WEBHOOK_STOP)
+        thread.join(WEBHOOK_DRAIN_TIMEOUT if timeout is None else timeout)
+        if not thread.is_alive():
+            return
+        unhandled = []
+        while True:
+            try:
+                event = self._webhook_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _WEBHOOK_STOP:
+                unhandled.append(event['id'])
+                _forget_event(event['id'])
+        logging.error(f"Webhook events left unhandled at exit: {', '.join(unhandled) or 'in-flight batch'}")
+    
+    def _dispatch_webhook_batch(self, events: List[Dict]):
+        """Run the handlers for a batch of events, grouped by event type
+
+        Events whose handler failed lose their seen mark, so a redelivery or
+        a resend from the Stripe dashboard is handled rather than skipped.
+        """
+        grouped = {}
+        for event in events:
+            grouped.setdefault(event['type'], []).append(event)
+        for event_type, typed_events in grouped.items():
+            objects = [event['data']['object'] for event in typed_events]
+            try:
+                failed = self._webhook_handlers[event_type](objects) or ()
+            except Exception as e:
+                logging.error(f"Error handling {event_type} webhooks: {str(e)}")
+                failed = objects
+            failed_ids = {id(obj) for obj in failed}
+            for event, obj in zip(typed_events, objects):
+                if id(obj) in failed_ids:
+                    _forget_event(event['id'])
+    
+    @staticmethod
+    def _per_event(event_type: str, handler):
+        """Adapt a single-object handler to a batch, isolating failures per event"""
+        def handle_batch(objects: List[Dict]) -> List[Dict]:
+            failed = []
+            for obj in objects:
+                try:
+                    handler(obj)
+                except Exception as e:
+                    logging.error(f"Error handling {event_type} webhook: {str(e)}")
+                    failed.append(obj)
+            return failed
+        return handle_batch
+    
     def _handle_subscription_created(self, subscription: Dict):
         """Handle subscription created event"""
         logging.info(f"Subscription created: {subscription['id']}")
@@ -193,3 +400,67 @@ class PaymentService:
 
 # Global payment service instance
 payment_service = PaymentService()
+atexit.register(payment_service.drain_webhooks)
+
+STRIPE_ASYNC_WORKERS = int(os.environ.get('STRIPE_ASYNC_WORKERS', 8))
+
+class AsyncPaymentService:
+    """Awaitable PaymentService for async callers
+
+    stripe 7.x has no async client, so each call runs the sync SDK on a
+    dedicated thread pool; slow Stripe round trips then neither block the
+    event loop nor starve its default executor.
+    """
+
+    def __init__(self, service: PaymentService):
+        self.service = service
+        self._executor = None
+        self._executor_pid = None
+
+    @property
+    def stripe_enabled(self) -> bool:
+        return self.service.stripe_enabled
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive fork, so each worker starts its own pool
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=STRIPE_ASYNC_WORKERS, thread_name_prefix='stripe')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+
+    async def create_customer(self, email: str, name: str = None, company: str = None) -> Optional[Dict]:
+        """Create Stripe customer"""
+        return await self._run(self.service.create_customer, email, name, company)
+
+    async def create_subscription(self, customer_id: str, price_id: str) -> Optional[Dict]:
+        """Create subscription for customer"""
+        return await self._run(self.service.create_subscription, customer_id, price_id)
+
+    async def get_subscription(self, subscription_id: str) -> Optional[Dict]:
+        """Get subscription details"""
+        return await self._run(self.service.get_subscription, subscription_id)
+
+    async def cancel_subscription(self, subscription_id: str) -> bool:
+        """Cancel subscription"""
+        return await self._run(self.service.cancel_subscription, subscription_id)
+
+    async def create_payment_intent(self, amount: int, currency: str = 'usd', customer_id: str = None) -> Optional[Dict]:
+        """Create payment intent for one-time payments"""
+        return await self._run(self.service.create_payment_intent, amount, currency, customer_id)
+
+    async def handle_webhook(self, payload: str, sig_header: str) -> bool:
+        """Handle Stripe webhook events"""
+        return await self._run(self.service.handle_webhook, payload, sig_header)
+
+    def close(self):
+        """Stop the worker threads without waiting on in-flight calls"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+# Global async payment service instance
+async_payment_service = AsyncPaymentService(payment_service)
@@ -0,0 +1,63 @@
+"""
+Supabase Client for VeroctaAI
+Shares one keep-alive HTTP connection pool across Supabase API calls
+"""
+
+import os
+import logging
+import threading
+from typing import Optional
+
+import httpx
+from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+
+_lock = threading.Lock()
+_http_client = None
+_supabase_clients = {}
+_owner_pid = None
+
+def _reset_after_fork():
+    """Drop clients inherited from a parent process; sockets can't be shared across forks"""
+    global _http_client, _owner_pid
+    if _owner_pid != os.getpid():
+        _http_client = None
+        _supabase_clients.clear()
+        _owner_pid = os.getpid()
+
+def get_http_client() -> httpx.Client:
+    """Get the process-wide keep-alive HTTP client"""
+    global _http_client
+    with _lock:
+        _reset_after_fork()
+        if _http_client is None:
+            _http_client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=20,
+                    max_connections=50,
+                    keepalive_expiry=60
+                )
+            )
+        return _http_client
+
+def get_supabase_client(url: str = None, key: str = None) -> Optional[Client]:
+    """Get a Supabase client backed by the shared HTTP connection pool"""
+    url = url or os.environ.get("SUPABASE_URL")
+    key = key or os.environ.get("SUPABASE_ANON_KEY")
+    if not url or not key:
+        return None
+    
+    http_client = get_http_client()
+    with _lock:
+        client = _supabase_clients.get((url, key))
+        if client is None:
+            try:
+                options = ClientOptions(httpx_client=http_client)
+            except TypeError:
+                # Older supabase-py releases build their own httpx clients
+                logging.info("supabase-py does not accept a shared httpx client - using SDK defaults")
+                options = ClientOptions()
+            client = create_client(url, key, options=options)
+            _supabase_clients[(url, key)] = client
+        return client
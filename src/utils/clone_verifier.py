@@ -4,44 +4,95 @@ Provides project integrity checking functionality
 """
 
 import os
+import copy
+import asyncio
 import hashlib
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-def verify_project_integrity():
+# Files hashed at once; reads overlap and file_digest hashes without the GIL
+HASH_WORKERS = 8
+
+# Core project files that should exist
+CORE_FILES = (
+    'app.py',
+    'routes.py',
+    'auth.py',
+    'database.py',
+    'models.py',
+    'health.py',
+    'requirements.txt',
+    'pyproject.toml'
+)
+
+_BASE_REPORT = {
+    'status': 'healthy',
+    'message': 'Project integrity verified',
+    'files_checked': 0,
+    'files_matched': 0,
+    'files_modified': 0,
+    'files_missing': 0
+}
+
+# Seconds a report is reused while the checked files are unchanged
+REPORT_CACHE_TTL = 30
+_report_cache = {}
+_report_cache_lock = threading.Lock()
+
+def _report_signature(report):
+    """Project root mtime (changes when files are added or removed), plus the
+    mtimes of the hashed files when the report carries hashes"""
+    signature = [os.stat('.').st_mtime_ns]
+    for file_path in report.get('file_hashes', ()):
+        try:
+            signature.append(os.stat(file_path).st_mtime_ns)
+        except OSError:
+            signature.append(0)
+    return tuple(signature)
+
+def verify_project_integrity(include_hashes=False):
     """
     Verify the integrity of the project files
-    Returns a report of the verification status
+    Returns a report of the verification status, with SHA-256 hashes of the
+    core files present when include_hashes is set. Reports are reused for
+    REPORT_CACHE_TTL seconds unless the checked files change; each caller
+    gets its own deep copy.
     """
-    # List of core project files that should exist
-    core_files = [
-        'app.py',
-        'routes.py', 
-        'auth.py',
-        'database.py',
-        'models.py',
-        'health.py',
-        'requirements.txt',
-        'pyproject.toml'
-    ]
+    with _report_cache_lock:
+        cached = _report_cache.get(include_hashes)
+    if cached is not None:
+        expires_at, signature, report = cached
+        try:
+            if time.monotonic() < expires_at and _report_signature(report) == signature:
+                return copy.deepcopy(report)
+        except OSError:
+            pass
     
-    report = {
-        'status': 'healthy',
-        'message': 'Project integrity verified',
-        'timestamp': datetime.utcnow().isoformat(),
-        'files_checked': 0,
-        'files_matched': 0,
-        'files_modified': 0,
-        'files_missing': 0,
-        'deviations': []
-    }
+    report = _build_integrity_report(include_hashes)
+    if report['status'] != 'error':
+        try:
+            entry = (time.monotonic() + REPORT_CACHE_TTL, _report_signature(report), report)
+            with _report_cache_lock:
+                _report_cache[include_hashes] = entry
+        except OSError:
+            pass
+    return copy.deepcopy(report)
+
+def _build_integrity_report(include_hashes):
+    report = dict(_BASE_REPORT, timestamp=datetime.utcnow().isoformat(), deviations=[])
     
     try:
+        # One directory read instead of a stat per file
+        entries = {entry.name for entry in os.scandir('.')}
+        
         # Check if core files exist
-        for file_path in core_files:
+        for file_path in CORE_FILES:
             report['files_checked'] += 1
             
-            if os.path.exists(file_path):
+            if file_path in entries:
                 report['files_matched'] += 1
                 logging.debug(f"✅ File exists: {file_path}")
             else:
@@ -53,13 +104,17 @@ def verify_project_integrity():
                 })
                 logging.warning(f"❌ Missing file: {file_path}")
         
+        if include_hashes:
+            present = [file_path for file_path in CORE_FILES if file_path in entries]
+            report['file_hashes'] = get_file_hashes(present)
+        
         # Check for additional project structure
-        if os.path.exists('uploads'):
+        if 'uploads' in entries:
             logging.debug("✅ Uploads directory exists")
         else:
             logging.info("ℹ️ Uploads directory will be created on first use")
             
-        if os.path.exists('outputs'):
+        if 'outputs' in entries:
             logging.debug("✅ Outputs directory exists")
         else:
             logging.info("ℹ️ Outputs directory will be created on first use")
@@ -88,10 +143,30 @@ def get_file_hash(file_path):
     """
     try:
         with open(file_path, 'rb') as f:
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+: reads and hashes in C without the GIL
+                return hashlib.file_digest(f, 'sha256').hexdigest()
             file_hash = hashlib.sha256()
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(1 << 20), b""):
                 file_hash.update(chunk)
         return file_hash.hexdigest()
     except Exception as e:
         logging.error(f"Error calculating hash for {file_path}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def get_file_hashes(file_paths):
+    """
+    Calculate SHA-256 hashes of several files concurrently
+    """
+    if not file_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(HASH_WORKERS, len(file_paths))) as executor:
+        return dict(zip(file_paths, executor.map(get_file_hash, file_paths)))
+
+async def verify_project_integrity_async(include_hashes=False):
+    """verify_project_integrity on a worker thread, for async callers"""
+    return await asyncio.to_thread(verify_project_integrity, include_hashes)
+
+async def get_file_hash_async(file_path):
+    """get_file_hash on a worker thread, for async callers"""
+    return await asyncio.to_thread(get_file_hash, file_path)
@@ -0,0 +1,129 @@
+"""Tests for the email queue claim/lease in EmailService.drain.
+
+They need a scratch Postgres database (SKIP LOCKED, UPDATE ... RETURNING,
+gen_random_uuid()), given as TEST_DATABASE_URL; skipped otherwise.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+if not TEST_DATABASE_URL:
+    pytest.skip('TEST_DATABASE_URL not set', allow_module_level=True)
+
+from sqlalchemy import create_engine, delete, select
+
+from src.core.database_enhanced import EmailQueue
+from src.services import email_service as emails
+
+TEST_DOMAIN = '@queue-test.invalid'
+
+
+@pytest.fixture(scope='module')
+def engine():
+    engine = create_engine(TEST_DATABASE_URL)
+    EmailQueue.__table__.create(engine, checkfirst=True)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def service(engine, monkeypatch):
+    with engine.begin() as connection:
+        # Other pending rows would be claimed alongside the test's own
+        connection.execute(delete(EmailQueue).where(EmailQueue.status == 'pending'))
+    service = emails.EmailService()
+    monkeypatch.setattr(service, '_queue_db', lambda: SimpleNamespace(engine=engine))
+    yield service
+    with engine.begin() as connection:
+        connection.execute(delete(EmailQueue).where(EmailQueue.to_email.like(f'%{TEST_DOMAIN}')))
+
+
+def _queue_row(engine, name, **values):
+    with engine.begin() as connection:
+        return connection.execute(
+            EmailQueue.__table__.insert().returning(EmailQueue.id),
+            {
+                'to_email': f'{name}{TEST_DOMAIN}',
+                'subject': 'Queue test',
+                'html_content': '<p>test</p>',
+                'scheduled_at': datetime.utcnow() - timedelta(seconds=1),
+                **values
+            }
+        ).scalar_one()
+
+
+def _row(engine, email_id):
+    with engine.connect() as connection:
+        return connection.execute(select(EmailQueue).where(EmailQueue.id == email_id)).one()
+
+
+class _Sender:
+    """Stands in for _send_batch, recording claimed ids"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.claimed = []
+
+    def __call__(self, rows):
+        self.claimed.extend(row.id for row in rows)
+        return [(row.id, self.error) for row in rows]
+
+
+def test_drain_sends_due_rows_once(engine, service, monkeypatch):
+    email_id = _queue_row(engine, 'due')
+    later_id = _queue_row(engine, 'later', scheduled_at=datetime.utcnow() + timedelta(hours=1))
+    sender = _Sender()
+    monkeypatch.setattr(service, '_send_batch', sender)
+
+    assert service.drain() == 1
+    assert service.drain() == 0
+
+    assert sender.claimed == [email_id]
+    row = _row(engine, email_id)
+    assert (row.status, row.attempts) == ('sent', 1)
+    assert row.sent_at is not None
+    assert _row(engine, later_id).status == 'pending'
+
+
+def test_claimed_rows_stay_hidden_until_the_lease_lapses(engine, service, monkeypatch):
+    monkeypatch.setattr(emails, 'EMAIL_QUEUE_LEASE', 1)
+    email_id = _queue_row(engine, 'lease')
+
+    def crash(rows):
+        raise RuntimeError('worker died mid-batch')
+
+    monkeypatch.setattr(service, '_send_batch', crash)
+    with pytest.raises(RuntimeError):
+        service.drain()
+
+    sender = _Sender()
+    monkeypatch.setattr(service, '_send_batch', sender)
+    assert service.drain() == 0
+    assert sender.claimed == []
+
+    time.sleep(1.2)
+    assert service.drain() == 1
+    assert sender.claimed == [email_id]
+    row = _row(engine, email_id)
+    assert (row.status, row.attempts) == ('sent', 2)
+
+
+def test_failed_sends_retry_until_max_attempts(engine, service, monkeypatch):
+    monkeypatch.setattr(emails, 'EMAIL_QUEUE_LEASE', 0)
+    email_id = _queue_row(engine, 'failing', max_attempts=2)
+    monkeypatch.setattr(service, '_send_batch', _Sender(error='HTTP 500'))
+
+    assert service.drain() == 0
+    row = _row(engine, email_id)
+    assert (row.status, row.attempts, row.error_message) == ('pending', 1, 'HTTP 500')
+
+    assert service.drain() == 0
+    row = _row(engine, email_id)
+    assert (row.status, row.attempts) == ('failed', 2)
+
+    assert service.drain() == 0
+    assert _row(engine, email_id).attempts == 2
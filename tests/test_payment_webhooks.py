@@ -0,0 +1,192 @@
+"""Tests for Stripe webhook batching and duplicate suppression in PaymentService."""
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('stripe')
+pytest.importorskip('flask_jwt_extended')
+
+from src.core import auth
+from src.services import payment_service as payments
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def _event(event_id, event_type='invoice.payment_succeeded', object_id=None):
+    return {
+        'id': event_id,
+        'object': 'event',
+        'type': event_type,
+        'data': {'object': {'id': object_id or f'obj_{event_id}'}},
+    }
+
+
+def _signed(payload):
+    """Stripe-Signature header for payload, as Stripe computes it"""
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(auth, 'get_redis_client', lambda: None)
+    with payments._seen_events_lock:
+        payments._seen_events.clear()
+    service = payments.PaymentService()
+    service.stripe_enabled = True
+    service._webhook_secret = WEBHOOK_SECRET
+    return service
+
+
+def _record_batches(service, event_type='invoice.payment_succeeded'):
+    batches = []
+    done = threading.Condition()
+
+    def handle_batch(objects):
+        with done:
+            batches.append([obj['id'] for obj in objects])
+            done.notify_all()
+
+    service._webhook_handlers[event_type] = handle_batch
+    return batches, done
+
+
+def _wait_for(done, predicate):
+    with done:
+        assert done.wait_for(predicate, timeout=5)
+
+
+def test_queued_events_are_dispatched_in_capped_batches(service, monkeypatch):
+    monkeypatch.setattr(payments, 'WEBHOOK_BATCH_SIZE', 2)
+    monkeypatch.setattr(payments, 'WEBHOOK_MAX_WAIT', 0.5)
+    batches, done = _record_batches(service)
+    for i in range(5):
+        service._webhook_queue.put(_event(f'evt_{i}'))
+
+    service._start_webhook_worker()
+    _wait_for(done, lambda: sum(map(len, batches)) == 5)
+
+    assert batches == [['obj_evt_0', 'obj_evt_1'], ['obj_evt_2', 'obj_evt_3'], ['obj_evt_4']]
+
+
+def test_batch_closes_after_max_wait(service, monkeypatch):
+    monkeypatch.setattr(payments, 'WEBHOOK_MAX_WAIT', 0.05)
+    batches, done = _record_batches(service)
+
+    service._start_webhook_worker()
+    service._webhook_queue.put(_event('evt_early'))
+    _wait_for(done, lambda: len(batches) == 1)
+    service._webhook_queue.put(_event('evt_late'))
+    _wait_for(done, lambda: len(batches) == 2)
+
+    assert batches == [['obj_evt_early'], ['obj_evt_late']]
+
+
+def test_drain_handles_queued_events_before_exit(service, monkeypatch):
+    monkeypatch.setattr(payments, 'WEBHOOK_MAX_WAIT', 30)
+    batches, _ = _record_batches(service)
+
+    service._start_webhook_worker()
+    service._webhook_queue.put(_event('evt_1'))
+    service._webhook_queue.put(_event('evt_2'))
+    service.drain_webhooks(timeout=5)
+
+    assert batches == [['obj_evt_1', 'obj_evt_2']]
+    assert not service._webhook_thread.is_alive()
+
+
+def test_events_left_after_drain_timeout_lose_their_seen_mark(service):
+    release = threading.Event()
+    service._webhook_handlers['invoice.payment_succeeded'] = lambda objects: release.wait(5)
+
+    service._start_webhook_worker()
+    for event_id in ('evt_busy', 'evt_waiting'):
+        assert payments._mark_event_seen(event_id)
+        service._webhook_queue.put(_event(event_id))
+        # Past WEBHOOK_MAX_WAIT, so evt_busy's batch is in its handler
+        time.sleep(0.2)
+    service.drain_webhooks(timeout=0.05)
+    release.set()
+
+    assert payments._mark_event_seen('evt_waiting') is True
+    assert payments._mark_event_seen('evt_busy') is False
+
+
+def test_handler_failure_is_isolated_per_event(service):
+    handled = []
+
+    def handle(obj):
+        if obj['id'] == 'bad':
+            raise ValueError('boom')
+        handled.append(obj['id'])
+
+    service._webhook_handlers['invoice.payment_failed'] = service._per_event('invoice.payment_failed', handle)
+    batches, _ = _record_batches(service)
+
+    service._dispatch_webhook_batch([
+        _event('evt_1', 'invoice.payment_failed', 'first'),
+        _event('evt_2', 'invoice.payment_succeeded', 'paid'),
+        _event('evt_3', 'invoice.payment_failed', 'bad'),
+        _event('evt_4', 'invoice.payment_failed', 'last'),
+    ])
+
+    assert handled == ['first', 'last']
+    assert batches == [['paid']]
+
+
+def test_failed_events_lose_their_seen_mark(service):
+    def handle(obj):
+        if obj['id'] == 'bad':
+            raise ValueError('boom')
+
+    def broken_batch(objects):
+        raise RuntimeError('database down')
+
+    service._webhook_handlers['invoice.payment_failed'] = service._per_event('invoice.payment_failed', handle)
+    service._webhook_handlers['invoice.payment_succeeded'] = broken_batch
+    events = [
+        _event('evt_ok', 'invoice.payment_failed', 'fine'),
+        _event('evt_bad', 'invoice.payment_failed', 'bad'),
+        _event('evt_paid', 'invoice.payment_succeeded', 'paid'),
+    ]
+    for event in events:
+        assert payments._mark_event_seen(event['id'])
+
+    service._dispatch_webhook_batch(events)
+
+    assert payments._mark_event_seen('evt_ok') is False
+    assert payments._mark_event_seen('evt_bad') is True
+    assert payments._mark_event_seen('evt_paid') is True
+
+
+def test_redelivered_event_is_acknowledged_but_not_queued(service, monkeypatch):
+    monkeypatch.setattr(service, '_start_webhook_worker', lambda: None)
+    payload = json.dumps(_event('evt_dup'))
+
+    assert service.handle_webhook(payload, _signed(payload)) is True
+    assert service.handle_webhook(payload, _signed(payload)) is True
+
+    assert service._webhook_queue.qsize() == 1
+    assert service._webhook_queue.get_nowait()['id'] == 'evt_dup'
+
+
+def test_unhandled_event_types_are_not_queued(service, monkeypatch):
+    monkeypatch.setattr(service, '_start_webhook_worker', lambda: None)
+    payload = json.dumps(_event('evt_other', 'charge.refunded'))
+
+    assert service.handle_webhook(payload, _signed(payload)) is True
+    assert service._webhook_queue.qsize() == 0
+
+
+def test_bad_signature_is_rejected_before_dedupe(service, monkeypatch):
+    monkeypatch.setattr(service, '_start_webhook_worker', lambda: None)
+    payload = json.dumps(_event('evt_forged'))
+
+    assert service.handle_webhook(payload, 't=1,v1=deadbeef') is False
+    assert service.handle_webhook(payload, _signed(payload)) is True
+    assert service._webhook_queue.qsize() == 1
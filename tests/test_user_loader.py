@@ -0,0 +1,69 @@
+"""Tests for the batched user lookups in src.core.user_loader."""
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import pytest
+
+from src.core.user_loader import UserLoader
+
+
+def test_lookups_in_one_window_share_a_batch():
+    calls = []
+
+    def batch_fn(emails):
+        calls.append(sorted(emails))
+        return {email: {'email': email} for email in emails if email != 'missing@example.com'}
+
+    loader = UserLoader(batch_fn, delay=0.05)
+    first = loader.load('a@example.com')
+    second = loader.load('b@example.com')
+    repeat = loader.load('a@example.com')
+    missing = loader.load('missing@example.com')
+
+    assert repeat is first
+    assert first.result(timeout=2) == {'email': 'a@example.com'}
+    assert second.result(timeout=2) == {'email': 'b@example.com'}
+    assert missing.result(timeout=2) is None
+    assert calls == [['a@example.com', 'b@example.com', 'missing@example.com']]
+
+
+def test_lookups_after_dispatch_start_a_new_batch():
+    calls = []
+
+    def batch_fn(emails):
+        calls.append(list(emails))
+        return {}
+
+    loader = UserLoader(batch_fn, delay=0.01)
+    loader.load('a@example.com').result(timeout=2)
+    loader.load('a@example.com').result(timeout=2)
+
+    assert calls == [['a@example.com'], ['a@example.com']]
+
+
+def test_batch_failure_reaches_every_waiter():
+    def batch_fn(emails):
+        raise RuntimeError('database down')
+
+    loader = UserLoader(batch_fn, delay=0.01)
+    futures = [loader.load('a@example.com'), loader.load('b@example.com')]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match='database down'):
+            future.result(timeout=2)
+
+
+def test_slow_batch_times_out_waiters_then_resolves():
+    release = threading.Event()
+
+    def batch_fn(emails):
+        release.wait(2)
+        return {email: {'email': email} for email in emails}
+
+    loader = UserLoader(batch_fn, delay=0.01)
+    future = loader.load('a@example.com')
+
+    with pytest.raises(FuturesTimeoutError):
+        future.result(timeout=0.05)
+    release.set()
+    assert future.result(timeout=2) == {'email': 'a@example.com'}